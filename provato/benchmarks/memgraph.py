@@ -0,0 +1,392 @@
+"""
+In-memory stand-in for main.graph.neo4j_connector, plus a stubbed LLM.
+
+MemGraph loads generate() output with the same node labels and
+relationships as uploading_neo4j.py and answers the connector functions
+with the same return shapes, so views can be exercised without AuraDB or
+OpenAI. install() swaps it into the connector, the views and llm.
+"""
+import math
+import re
+import time
+
+from main.graph import neo4j_connector as real
+from main.graph.farm_summary import build_summary
+from main.graph.telemetry import AnomalyDetector, acc_magnitude
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+FULLTEXT_KEYS = ["name", "tag", "breed", "breed_short", "id_api", "type", "sex", "owner", "station_city"]
+STUB_CYPHER_RE = re.compile(
+    r"MATCH \((?P<var>\w+):(?P<label>\w+)(?: \{(?P<key>\w+): '(?P<value>[^']*)'\})?\) RETURN (?P=var)"
+    r"(?: LIMIT (?P<limit>\d+))?"
+)
+# Question shapes the stub planner can turn into Cypher: a farm by name, an animal by tag.
+STUB_PLANS = [
+    (re.compile(r"\b(Farm\d+)\b"), "MATCH (f:Farm {{name: '{}'}}) RETURN f LIMIT 25"),
+    (re.compile(r"\b(S\d{5})\b"), "MATCH (a:Animal {{id_api: '{}'}}) RETURN a LIMIT 25"),
+]
+
+
+def _display(props, keys=("name", "tag", "breed")):
+    for key in keys:
+        if props.get(key):
+            return props[key]
+    return "(Unnamed)"
+
+
+class MemGraph:
+    def __init__(self):
+        self.nodes = {}
+        self.adj = {}
+        self.fulltext = {}
+        self.version = 1
+        self.farm_summaries = {}
+
+    # ---- building ----
+    def add_node(self, label, key, props):
+        node_id = f"{label}:{key}"
+        self.nodes[node_id] = {"labels": [label], "props": props}
+        self.adj.setdefault(node_id, [])
+        for field in FULLTEXT_KEYS:
+            for token in TOKEN_RE.findall(str(props.get(field) or "").lower()):
+                self.fulltext.setdefault(token, set()).add(node_id)
+        return node_id
+
+    def add_rel(self, start, rel_type, end):
+        if start in self.nodes and end in self.nodes:
+            self.adj[start].append((rel_type, end))
+            self.adj[end].append((rel_type, start))
+
+    @classmethod
+    def from_data(cls, data):
+        """Nodes are keyed like uploading_neo4j.py keys them; readings find theirs by id_api."""
+        g = cls()
+        farms, animals, devices = {}, {}, {}
+        for row in data["farms"]:
+            farms[row["id_api"]] = g.add_node("Farm", row["id"], dict(row))
+        for row in data["animals"]:
+            props = {k: (v.strip() if isinstance(v, str) else v) for k, v in row.items()
+                     if k not in ("farm_id", "farm_id_api")}
+            animals[props["id_api"]] = g.add_node("Animal", row["id"], props)
+            g.add_rel(animals[props["id_api"]], "BELONGS_TO", f"Farm:{row['farm_id']}")
+        for row in data["devices"]:
+            props = {"id": row["id"], "id_api": row["id_api"].strip(), "type": row["type"].strip()}
+            devices[props["id_api"]] = g.add_node("Device", row["id"], props)
+            g.add_rel(devices[props["id_api"]], "ATTACHED_TO", animals.get(row["id_animal"].strip()))
+
+        detector = AnomalyDetector()
+        for row in data["device_data"]:
+            props = {k: v for k, v in row.items() if k != "id_api"}
+            for key in ("acc_x", "acc_y", "acc_z", "std_x", "std_y", "std_z", "max_x", "max_y", "max_z",
+                        "temperature"):
+                props[key] = float(props[key])
+            reading = g.add_node("DeviceData", row["id"], props)
+            device = devices.get(row["id_api"])
+            g.add_rel(reading, "FROM_DEVICE", device)
+            attached = [n for t, n in g.adj.get(device, []) if t == "ATTACHED_TO"]
+            for animal in attached:
+                vitals = g.nodes[animal]["props"]
+                if str(vitals.get("last_seen") or "") <= row["created"]:
+                    vitals.update(last_temperature=props["temperature"], last_seen=row["created"],
+                                  last_activity=round(acc_magnitude(row), 1))
+            for alert in detector.check(row["id_api"], row):
+                alert_id = g.add_node("Alert", alert["id"], {k: v for k, v in alert.items() if k != "reading_id"})
+                for animal in attached:
+                    g.add_rel(alert_id, "ABOUT", animal)
+                    vitals = g.nodes[animal]["props"]
+                    vitals["alert_count"] = vitals.get("alert_count", 0) + 1
+                    vitals[f"{alert['kind']}_alerts"] = vitals.get(f"{alert['kind']}_alerts", 0) + 1
+                g.add_rel(alert_id, "TRIGGERED_BY", reading)
+
+        for i, row in enumerate(data["meteo_data"]):
+            meteo = g.add_node("MeteoData", f"{row['farm_id_api']}_{row['station_timedata']}", dict(row))
+            g.add_rel(meteo, "FROM_FARM", farms.get(row["farm_id_api"]))
+        g.refresh_farm_summaries()
+        return g
+
+    def refresh_farm_summaries(self):
+        """What refresh_farm_summaries() stores as FarmSummary nodes."""
+        for node_id, node in self.nodes.items():
+            if "Farm" not in node["labels"]:
+                continue
+            animals = []
+            for rel_type, animal in self.adj[node_id]:
+                if rel_type == "BELONGS_TO":
+                    devices = [d for t, d in self.adj[animal] if t == "ATTACHED_TO"]
+                    animals.append(dict(self.nodes[animal]["props"],
+                                        device_id=self.nodes[devices[0]]["props"]["id_api"] if devices else None))
+            farm_id = node["props"]["id"]
+            self.farm_summaries[farm_id] = build_summary(farm_id, node["props"], animals)
+
+    # ---- connector contract ----
+    def universal_search(self, query: str, limit: int = 20):
+        scores = {}
+        for token in TOKEN_RE.findall((query or "").lower()):
+            for node_id in self.fulltext.get(token, ()):
+                scores[node_id] = scores.get(node_id, 0.0) + 1.0
+        ranked = sorted(scores.items(), key=lambda kv: -kv[1])[:limit]
+        return [{
+            "neo4j_id": node_id,
+            "labels": self.nodes[node_id]["labels"],
+            "props": self.nodes[node_id]["props"],
+            "score": score,
+            "display_name": _display(self.nodes[node_id]["props"]),
+        } for node_id, score in ranked]
+
+    def get_suggestions(self, partial: str):
+        if not partial:
+            return []
+        partial = partial.lower()
+        found = set()
+        for node in self.nodes.values():
+            props = node["props"]
+            if any(partial in str(props.get(k)).lower() for k in ("name", "tag", "breed", "owner") if k in props):
+                suggestion = props.get("name") or props.get("tag") or props.get("breed") or props.get("owner")
+                if suggestion:
+                    found.add(suggestion)
+        return sorted(found)[:10]
+
+    def get_node_by_id(self, node_id: str):
+        node = self.nodes.get(node_id)
+        if not node:
+            return None
+        return {"labels": node["labels"], "props": node["props"],
+                "display_name": _display(node["props"], ("name", "tag"))}
+
+    def get_node_with_rels(self, node_id: str):
+        return [{
+            "rel_type": rel_type,
+            "related_id": other,
+            "related_labels": self.nodes[other]["labels"],
+            "display_name": _display(self.nodes[other]["props"]),
+        } for rel_type, other in self.adj.get(node_id, [])]
+
+    def search_and_expand(self, question: str, top_k: int = 5, neighbor_limit: int = 15):
+        hits = self.universal_search(question, limit=top_k)
+        if not hits:
+            return {"nodes": [], "facts": [], "text_context": ""}
+        facts, nodes_out = [], []
+        for hit in hits:
+            display_name = hit["display_name"]
+            nodes_out.append({k: hit[k] for k in ("neo4j_id", "labels", "props", "display_name")})
+            for k, v in hit["props"].items():
+                facts.append(f"{display_name} ({'|'.join(hit['labels'])}): {k} = {v}")
+            for rel_type, other in self.adj.get(hit["neo4j_id"], [])[:neighbor_limit]:
+                related = self.nodes[other]
+                related_name = _display(related["props"], ("name", "tag"))
+                facts.append(f"{display_name} -[{rel_type}]-> {related_name} ({'|'.join(related['labels'])})")
+                for key in ["breed", "age", "owner", "farm", "health_status", "last_vaccination"]:
+                    if key in related["props"]:
+                        facts.append(f"{related_name}: {key} = {related['props'][key]}")
+        return {"nodes": nodes_out, "facts": facts, "text_context": "\n".join(facts)}
+
+    def search_and_expand_ranked(self, question: str, top_k: int = 5, hops: int = 3, budget: int = 40):
+        """Python rendering of RANKED_EXPANSION, using the connector's weights."""
+        hits = self.universal_search(question, limit=top_k)
+        if not hits:
+            return {"nodes": [], "facts": [], "text_context": ""}
+        series = ("DeviceData", "MeteoData")
+        weight = lambda rel: real.REL_WEIGHTS.get(rel, real.DEFAULT_REL_WEIGHT)  # noqa: E731
+        best = {}
+        facts, nodes_out = [], []
+        for hit in hits:
+            seed = hit["neo4j_id"]
+            nodes_out.append({k: hit[k] for k in ("neo4j_id", "labels", "props", "display_name")})
+            facts += [f"{hit['display_name']} ({'|'.join(hit['labels'])}): {k} = {v}" for k, v in hit["props"].items()]
+
+            reached = {seed: (1.0, [])}
+            frontier = [(seed, 1.0, [], {seed})]
+            for depth in range(1, max(1, min(hops, 3)) + 1):
+                next_frontier = []
+                for node, score, via, seen in frontier:
+                    for rel_type, other in self.adj[node]:
+                        if other in seen or self.nodes[other]["labels"][0] in series:
+                            continue
+                        s = score * weight(rel_type) * (real.HOP_DECAY if depth > 1 else 1.0)
+                        if s > reached.get(other, (0.0,))[0]:
+                            reached[other] = (s, via + [rel_type])
+                        next_frontier.append((other, s, via + [rel_type], seen | {other}))
+                frontier = next_frontier
+
+            for node, (score, via) in reached.items():
+                candidates = []
+                if node != seed:
+                    degree = len(self.adj[node])
+                    candidates.append((node, via, score / (1 + real.DEGREE_PENALTY * math.log10(1 + degree))))
+                readings = [(rel, other) for rel, other in self.adj[node]
+                            if rel in ("FROM_DEVICE", "FROM_FARM") and self.nodes[other]["labels"][0] in series]
+                readings.sort(key=lambda ro: str(self.nodes[ro[1]]["props"].get("created")
+                                                 or self.nodes[ro[1]]["props"].get("station_timedata")), reverse=True)
+                for i, (rel, other) in enumerate(readings[:real.LATEST_READINGS]):
+                    candidates.append((other, via + [rel], score * weight(rel) * real.RECENCY_DECAY ** i))
+                for fact, fact_via, fact_score in candidates:
+                    if fact_score > best.get(fact, (0.0,))[0]:
+                        best[fact] = (fact_score, fact_via, hit["display_name"])
+
+        for fact, (score, via, seed_name) in sorted(best.items(), key=lambda kv: -kv[1][0])[:budget]:
+            record = {"labels": self.nodes[fact]["labels"], "props": self.nodes[fact]["props"], "via": via}
+            facts += real._ranked_facts(seed_name, record)
+            facts += real._stored_reading_facts(record)
+        return {"nodes": nodes_out, "facts": facts, "text_context": "\n".join(facts)}
+
+    def expand_question(self, question: str):
+        if real.RETRIEVAL_MODE == "ranked":
+            return self.search_and_expand_ranked(question)
+        return self.search_and_expand(question)
+
+    def get_farm_summaries(self, farm_id: str = None):
+        if farm_id is not None:
+            return [self.farm_summaries[farm_id]] if farm_id in self.farm_summaries else []
+        return [self.farm_summaries[k] for k in sorted(self.farm_summaries)]
+
+    def precise_lookup(self, plan: dict, limit: int = 5, neighbor_limit: int = 20):
+        if not plan or not plan.get("name"):
+            return {"nodes": [], "facts": [], "text_context": ""}
+        hits = [h for h in self.universal_search(plan["name"], limit=limit)
+                if not plan.get("labels") or set(plan["labels"]) & set(h["labels"])]
+        facts = []
+        for hit in hits:
+            facts += [f"{hit['display_name']}: {k} = {v}" for k, v in hit["props"].items()]
+            for rel_type, other in self.adj.get(hit["neo4j_id"], [])[:neighbor_limit]:
+                facts.append(f"{hit['display_name']} -[{rel_type}]- {_display(self.nodes[other]['props'], ('name', 'tag'))}")
+        return {"nodes": hits, "facts": facts, "text_context": "\n".join(facts)}
+
+    def run_generated_cypher(self, cypher: str, limit: int = 100):
+        """
+        Runs the one Cypher shape the stub planner emits,
+        MATCH (v:Label {key: 'value'}) RETURN v [LIMIT n]. Anything else fails
+        the way Neo4j rejects invalid Cypher.
+        """
+        match = STUB_CYPHER_RE.fullmatch((cypher or "").strip())
+        if not match:
+            return {"error": "Invalid input: the stand-in only runs MATCH ... RETURN", "facts": [], "text_context": ""}
+        var, label, key, value, limit_text = match.group("var", "label", "key", "value", "limit")
+        facts, nodes_out = [], []
+        for node_id, node in self.nodes.items():
+            if label not in node["labels"] or (key and str(node["props"].get(key)) != value):
+                continue
+            facts.append(f"{var}: {node['props']}")
+            nodes_out.append({"neo4j_id": node_id, "labels": node["labels"], "props": node["props"],
+                              "display_name": _display(node["props"], ("name", "tag"))})
+            if len(facts) >= int(limit_text or limit):
+                break
+        return {"nodes": nodes_out, "facts": facts, "text_context": "\n".join(facts)}
+
+    def get_graph_version(self) -> int:
+        return self.version
+
+    def get_alerted_animals(self, since: str = None, kind: str = None, limit: int = 50):
+        per_animal = {}
+        for node_id, node in self.nodes.items():
+            if "Alert" not in node["labels"]:
+                continue
+            props = node["props"]
+            if (since and str(props.get("created")) < since) or (kind and props.get("kind") != kind):
+                continue
+            for rel_type, other in self.adj[node_id]:
+                if rel_type == "ABOUT":
+                    entry = per_animal.setdefault(other, {"alert_count": 0, "last_alert": None, "kinds": set()})
+                    entry["alert_count"] += 1
+                    entry["last_alert"] = max(filter(None, [entry["last_alert"], props.get("created")]))
+                    entry["kinds"].add(props.get("kind"))
+        animals = [{
+            "neo4j_id": animal,
+            "props": self.nodes[animal]["props"],
+            "display_name": _display(self.nodes[animal]["props"], ("name", "tag")),
+            "alert_count": e["alert_count"],
+            "last_alert": e["last_alert"],
+            "kinds": sorted(e["kinds"]),
+        } for animal, e in per_animal.items()]
+        animals.sort(key=lambda a: a["last_alert"] or "", reverse=True)
+        return animals[:limit]
+
+
+CONTRACT = ["universal_search", "get_suggestions", "get_node_by_id", "get_node_with_rels",
+            "search_and_expand", "precise_lookup", "run_generated_cypher", "get_alerted_animals",
+            "get_graph_version", "search_and_expand_ranked", "expand_question",
+            "get_farm_summaries"]
+
+
+# --------------------- Stubbed driver / LLM ---------------------
+class FakeResult(list):
+    def single(self):
+        return self[0] if self else None
+
+    def peek(self):
+        return self[0] if self else None
+
+
+class FakeTransaction:
+    """Accepts writes and counts them; nothing is stored."""
+
+    def __init__(self):
+        self.statements = 0
+
+    def run(self, query, parameters=None, **kwargs):
+        self.statements += 1
+        return FakeResult()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class FakeSession(FakeTransaction):
+    def begin_transaction(self):
+        return FakeTransaction()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeDriver:
+    def session(self, **kwargs):
+        return FakeSession()
+
+    def verify_connectivity(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def stub_plan(question: str) -> str:
+    """
+    Planner stand-in: Cypher for the question shapes in STUB_PLANS, otherwise
+    the text the real planner falls back to, so both retrieval paths are hit.
+    """
+    for pattern, template in STUB_PLANS:
+        match = pattern.search(question)
+        if match:
+            return template.format(match.group(1))
+    return "I do not have enough information."
+
+
+def stub_llm(latency_ms: float = 0.0):
+    def generate(prompt: str, purpose: str = "answer", fallback: str = None) -> str:
+        if latency_ms:
+            time.sleep(latency_ms / 1000.0)
+        if purpose == "plan":
+            return stub_plan(prompt.rsplit("Question:", 1)[-1])
+        return f"Stub answer grounded in {len(prompt)} prompt characters."
+    return generate
+
+
+def install(graph: MemGraph, llm_latency_ms: float = 0.0):
+    """Route the connector, the views and the LLM layer to the stand-ins."""
+    from main import aggregates, batch, http_cache, llm, views
+    from main.graph import neo4j_connector
+    from main.graph.driver import set_driver
+
+    set_driver(FakeDriver())
+    for name in CONTRACT:
+        setattr(neo4j_connector, name, getattr(graph, name))
+        for module in (views, batch, http_cache, aggregates):
+            if hasattr(module, name):
+                setattr(module, name, getattr(graph, name))
+    llm._openai_generate = stub_llm(llm_latency_ms)
@@ -0,0 +1,196 @@
+"""
+Repeatable benchmarks against the in-memory stand-in.
+
+    cd provato
+    python -m benchmarks.run                      # compare with baselines.json
+    python -m benchmarks.run --update-baseline    # record new baselines
+    python -m benchmarks.run --farms 20 --animals 50 --readings 500
+
+Each sample times enough back-to-back calls (garbage collection off) to
+last at least --min-sample-ms, right after a sample of a fixed pure-Python
+reference workload. A benchmark reports its fastest time per operation and
+is compared with its baseline by the median ratio to the reference, which
+cancels out the machine being faster or slower, or busier, than when the
+baselines were recorded.
+A benchmark fails when it is slower than its baseline by more than
+--tolerance (a fraction); the exit code is 1 if any benchmark fails.
+Baselines are only meaningful at the scale they were recorded at, so the
+scale is stored alongside them and a mismatch is reported.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+QUESTIONS = ["Zackel", "Farm2", "East Friesian females", "S00003", "GOAT", "Lacaune MALE"]
+AGGREGATE_QUESTIONS = ["How many females per breed on each farm?", "Average flock temperature",
+                       "How many active devices per farm?"]
+
+
+def _setup_django():
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "provato.settings")
+    import django
+    from django.conf import settings
+    django.setup()
+    settings.ALLOWED_HOSTS = ["*"]
+    settings.SESSION_ENGINE = "django.contrib.sessions.backends.cache"
+
+
+def _reference():
+    """Fixed CPU-bound work (dicts, strings, sorting), the yardstick for machine speed."""
+    counts = {}
+    for i in range(5000):
+        key = f"k{i % 997}"
+        counts[key] = counts.get(key, 0) + i
+    return sorted(counts.items(), key=lambda kv: kv[1])
+
+
+def _sample(fn, loops: int) -> float:
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        return (time.perf_counter() - start) / loops
+    finally:
+        gc.enable()
+
+
+def _loops(fn, min_sample: float) -> int:
+    start = time.perf_counter()
+    fn()  # warm-up, and a first estimate of how long one call takes
+    return max(1, math.ceil(min_sample / max(time.perf_counter() - start, 1e-6)))
+
+
+def _measure(fn, repeat: int, ops: int = 1, min_sample: float = 0.05):
+    """
+    (fastest seconds per operation, median cost relative to _reference()).
+    Each sample is paired with a reference sample taken just before it, so
+    the ratio cancels out the machine getting faster or slower mid-run.
+    """
+    loops, reference_loops = _loops(fn, min_sample), _loops(_reference, min_sample)
+    seconds, relative = [], []
+    for _ in range(repeat):
+        reference = _sample(_reference, reference_loops)
+        per_op = _sample(fn, loops) / ops
+        seconds.append(per_op)
+        relative.append(per_op / reference)
+    return min(seconds), statistics.median(relative)
+
+
+def run_benchmarks(args) -> dict:
+    _setup_django()
+    from django.test import Client
+
+    from benchmarks.memgraph import FakeTransaction, MemGraph, install
+    from benchmarks.synthetic import generate
+    from main.graph.telemetry import AnomalyDetector, write_device_batch
+
+    data = generate(args.farms, args.animals, args.readings, args.meteo, seed=args.seed)
+    graph = MemGraph.from_data(data)
+    install(graph, llm_latency_ms=args.llm_latency)
+    client = Client()
+    readings = data["device_data"]
+    print(f"Synthetic graph: {len(graph.nodes)} nodes, {len(readings)} readings")
+
+    def ingest():
+        detector, tx = AnomalyDetector(), FakeTransaction()
+        for i in range(0, len(readings), 500):
+            write_device_batch(tx, readings[i:i + 500], detector)
+
+    min_sample = args.min_sample_ms / 1000.0
+    results = {}
+    per_row, results["ingest_batch"] = _measure(ingest, args.repeat, ops=len(readings), min_sample=min_sample)
+    print(f"  ingest_batch          {1 / per_row:12.0f} rows/s (driver stubbed)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from main import ingest as ingest_module, views
+        views.INGEST_TOKEN = "benchmark"
+        buffer = ingest_module.ReadingBuffer(maxsize=500, spill_dir=os.path.join(tmp, "spill"))
+        ingest_module._buffer = buffer  # never started: measures acceptance only
+        body = json.dumps(readings[:500])
+
+        def accept():
+            response = client.post("/ingest/", data=body, content_type="application/json",
+                                   headers={"Authorization": "Bearer benchmark"})
+            assert response.status_code == 202, response.status_code
+            # Hand the rows off as the writer would, so the queue never fills.
+            while not buffer._queue.empty():
+                buffer._queue.get_nowait()
+            buffer._committed(500)
+        per_row, results["ingest_http_accept"] = _measure(accept, args.repeat, ops=500, min_sample=min_sample)
+        print(f"  ingest_http_accept    {1 / per_row:12.0f} rows/s")
+        ingest_module._buffer = None
+
+    cases = {
+        "universal_search": lambda: [graph.universal_search(q) for q in QUESTIONS],
+        "search_and_expand": lambda: [graph.search_and_expand(q) for q in QUESTIONS],
+        "search_and_expand_ranked": lambda: [graph.search_and_expand_ranked(q) for q in QUESTIONS],
+        "get_suggestions": lambda: [graph.get_suggestions(q[:3]) for q in QUESTIONS],
+        "chat_view": lambda: [client.get("/chat/", {"q": q}) for q in QUESTIONS],
+        "chat_view_aggregate": lambda: [client.get("/chat/", {"q": q}) for q in AGGREGATE_QUESTIONS],
+        "farm_summary_view": lambda: [client.get("/farms/summary/") for _ in QUESTIONS],
+    }
+    for name, fn in cases.items():
+        ops = len(AGGREGATE_QUESTIONS) if name == "chat_view_aggregate" else len(QUESTIONS)
+        per_op, results[name] = _measure(fn, args.repeat, ops=ops, min_sample=min_sample)
+        print(f"  {name:<20} {per_op * 1000:12.3f} ms/op")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--farms", type=int, default=4)
+    parser.add_argument("--animals", type=int, default=25, help="animals (and devices) per farm")
+    parser.add_argument("--readings", type=int, default=200, help="readings per device")
+    parser.add_argument("--meteo", type=int, default=200, help="weather observations per farm")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=15, help="samples per benchmark")
+    parser.add_argument("--min-sample-ms", type=float, default=50.0, help="minimum duration of one sample")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated LLM latency in ms")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    scale = {"farms": args.farms, "animals": args.animals, "readings": args.readings,
+             "meteo": args.meteo, "seed": args.seed, "llm_latency": args.llm_latency}
+    results = run_benchmarks(args)
+
+    if args.update_baseline:
+        with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+            json.dump({"scale": scale, "relative_cost": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baselines written to {BASELINES_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINES_PATH):
+        print("No baselines recorded; run with --update-baseline.")
+        return 0
+    with open(BASELINES_PATH, encoding="utf-8") as f:
+        baselines = json.load(f)
+    if baselines.get("scale") != scale:
+        print(f"Warning: baselines were recorded at scale {baselines.get('scale')}, not {scale}.")
+
+    failed = []
+    for name, cost in results.items():
+        base = baselines.get("relative_cost", {}).get(name)
+        if base is None:
+            continue
+        change = cost / base - 1
+        status = "REGRESSION" if change > args.tolerance else "ok"
+        print(f"  {name:<20} {change:+7.1%} vs baseline  {status}")
+        if status != "ok":
+            failed.append(name)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Synthetic farm data shaped like animals.csv, devices.csv, device_data.csv
+and meteo_data.csv, scaled to N farms, M animals per farm and K readings
+per device. Deterministic for a given seed.
+"""
+import csv
+import os
+import random
+from datetime import datetime, timedelta
+
+ANIMAL_FIELDS = ["id", "id_api", "name", "birth", "type", "sex", "breed", "breed_short",
+                 "farm_id_api", "farm_id"]
+DEVICE_FIELDS = ["id", "id_api", "type", "id_animal"]
+DEVICE_DATA_FIELDS = ["id", "id_api", "created", "acc_x", "acc_y", "acc_z", "std_x", "std_y", "std_z",
+                      "max_x", "max_y", "max_z", "temperature", "coordinates"]
+METEO_FIELDS = ["farm_id_api", "farm_name", "farm_longitude", "farm_latitude", "station_source",
+                "station_timedata", "crawled", "station_city", "station_nomos", "station_longitude",
+                "station_latitude", "temperature", "humidity", "wind", "direction", "yetos", "barometer",
+                "dew_point", "heat_index", "wind_chill", "solar_radiation"]
+FARM_FIELDS = ["id", "id_api", "name", "coordinates"]
+
+BREEDS = [("East Friesian", "EAF"), ("Zackel", "ZAC"), ("Chios", "CHI"),
+          ("Lacaune", "LAC"), ("Karagouniko", "KAR")]
+NAMES = ["Μαϊστράλω", "Λάγια", "Ασπρούλα", "Μαύρη", "Κανέλα", "Ζουμπούλα", "Βοσκούλα", "Ρόδω"]
+CITIES = [("Λίμνη Τάκα", "Αρκαδίας"), ("Τρίπολη", "Αρκαδίας"), ("Ελασσόνα", "Λάρισας")]
+START = datetime(2025, 9, 15)
+
+
+def generate(farms: int = 4, animals_per_farm: int = 4, readings_per_device: int = 200,
+             meteo_per_farm: int = 100, seed: int = 0) -> dict:
+    """Returns {"farms", "animals", "devices", "device_data", "meteo_data"} as lists of CSV-style dicts."""
+    rnd = random.Random(seed)
+    data = {"farms": [], "animals": [], "devices": [], "device_data": [], "meteo_data": []}
+    reading_id = 1
+
+    for f in range(1, farms + 1):
+        lon, lat = 22.0 + rnd.random(), 37.0 + rnd.random()
+        farm_name = f"Farm{f}"
+        farm_api = str(100 + f)  # like the real exports, the API id differs from the row id
+        data["farms"].append({"id": str(f), "id_api": farm_api, "name": farm_name,
+                              "coordinates": f"({lon:.6f},{lat:.6f})"})
+
+        for a in range(animals_per_farm):
+            n = (f - 1) * animals_per_farm + a + 1
+            tag = f"S{n:05d}"
+            breed, breed_short = rnd.choice(BREEDS)
+            data["animals"].append({
+                "id": str(n), "id_api": tag,
+                "name": f"{rnd.choice(NAMES)} ({breed_short} {n})",
+                "birth": (START - timedelta(days=rnd.randint(200, 2000))).strftime("%Y-%m-%d %H:%M:%S"),
+                "type": rnd.choice(["SHEEP", "SHEEP", "SHEEP", "GOAT"]),
+                "sex": rnd.choice(["FEMALE", "FEMALE", "FEMALE", "MALE"]),
+                "breed": breed, "breed_short": breed_short,
+                "farm_id_api": farm_api, "farm_id": str(f),
+            })
+            data["devices"].append({"id": str(n), "id_api": tag,
+                                    "type": rnd.choice(["Sigfox", "GSM"]), "id_animal": tag})
+
+            base_temp = rnd.uniform(27.0, 31.0)
+            for k in range(readings_per_device):
+                std = [rnd.randint(0, 900) for _ in range(3)]
+                data["device_data"].append({
+                    "id": str(reading_id), "id_api": tag,
+                    "created": (START + timedelta(hours=k, seconds=rnd.randint(0, 59))).strftime("%Y-%m-%d %H:%M:%S"),
+                    "acc_x": str(rnd.choice([-4096, -2048, 0, 2048, 8192])),
+                    "acc_y": str(rnd.choice([-2048, 0, 2048])),
+                    "acc_z": str(rnd.choice([-14336, -12288, -16384])),
+                    "std_x": str(std[0]), "std_y": str(std[1]), "std_z": str(std[2]),
+                    "max_x": str(std[0] * 4), "max_y": str(std[1] * 4), "max_z": str(std[2] * 4),
+                    "temperature": f"{base_temp + rnd.gauss(0, 0.6):.1f}",
+                    "coordinates": f"({lon + rnd.gauss(0, 1e-4):.9f},{lat + rnd.gauss(0, 1e-4):.9f})",
+                })
+                reading_id += 1
+
+        city, nomos = rnd.choice(CITIES)
+        for k in range(meteo_per_farm):
+            when = START + timedelta(minutes=20 * k)
+            data["meteo_data"].append({
+                "farm_id_api": farm_api, "farm_name": farm_name,
+                "farm_longitude": f"{lon:.6f}", "farm_latitude": f"{lat:.6f}",
+                "station_source": "SoDa",
+                "station_timedata": when.strftime("%Y-%m-%d %H:%M:%S.000000"),
+                "crawled": when.strftime("%Y-%m-%d %H:%M:%S.000000+03:00"),
+                "station_city": city, "station_nomos": nomos,
+                "station_longitude": f"{lon + 0.03:.7f}", "station_latitude": f"{lat + 0.01:.7f}",
+                "temperature": f"{rnd.uniform(8, 32):.6f}", "humidity": f"{rnd.uniform(30, 95):.6f}",
+                "wind": f"{rnd.uniform(0, 12):.1f}", "direction": f"{rnd.uniform(0, 360):.6f}",
+                "yetos": "0.0", "barometer": f"{rnd.uniform(930, 945):.6f}",
+                "dew_point": f"{rnd.uniform(5, 22):.6f}", "heat_index": "", "wind_chill": "",
+                "solar_radiation": f"{rnd.uniform(0, 900):.6f}",
+            })
+
+    return data
+
+
+def write_csvs(data: dict, out_dir: str):
+    """Write generate() output as farms.csv, animals.csv, devices.csv, device_data.csv, meteo_data.csv."""
+    os.makedirs(out_dir, exist_ok=True)
+    for name, fields in [("farms", FARM_FIELDS), ("animals", ANIMAL_FIELDS), ("devices", DEVICE_FIELDS),
+                         ("device_data", DEVICE_DATA_FIELDS), ("meteo_data", METEO_FIELDS)]:
+        with open(os.path.join(out_dir, f"{name}.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(data[name])
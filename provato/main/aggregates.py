@@ -0,0 +1,60 @@
+"""
+Farm-level aggregate questions ("how many females per breed", "average
+flock temperature") answered from the precomputed FarmSummary nodes instead
+of an LLM-generated Cypher aggregation over every Animal and reading.
+
+The keyword check below is a fast path for the obvious cases; anything it
+lets through is routed by the planner (see llm.extract_search_plan).
+"""
+import os
+import re
+
+from .graph.farm_summary import summary_facts, with_activity
+from .graph.neo4j_connector import get_farm_summaries
+
+FARM_ACTIVE_HOURS = float(os.getenv("FARM_ACTIVE_HOURS", "24"))
+
+AGGREGATE_PATTERN = re.compile(
+    r"\b(how many|count|number of|average|avg|per (breed|farm|sex|type)|by (breed|farm|sex|type)"
+    r"|breakdown|overview)\b"
+    r"|\b(πόσ\w*|μέσ[οη]\w*|ανά)\b",
+    re.IGNORECASE,
+)
+# ...and it has to be about farms or groups of animals/devices, not about one thing.
+FARM_SUBJECT_PATTERN = re.compile(
+    r"\b(farms?|flocks?|herds?|animals|sheep|goats|ewes|rams|females|males|breeds|devices|collars)\b"
+    r"|\b(φ[αά]ρμ\w*|κοπ[αά]δ\w*|ζώα|ζώων|πρόβατα|προβάτων|κατσ[ιί]κ\w*|αίγες|αιγών|συσκευ\w*|κολάρ\w*)",
+    re.IGNORECASE,
+)
+# Questions about one animal or collar (e.g. "S00003", "DT557", "animal 023") need the graph, not a summary.
+SPECIFIC_ENTITY_PATTERN = re.compile(r"\b[A-Z]{1,3}\d{3,}\b")
+NUMBERED_ENTITY_PATTERN = re.compile(
+    r"\b(animal|sheep|ewe|ram|goat|device|collar|ζώο|πρόβατο|συσκευή)\s+(no\.?\s*|#)?\d+\b",
+    re.IGNORECASE,
+)
+
+
+def is_aggregate_question(question: str) -> bool:
+    return bool(AGGREGATE_PATTERN.search(question)) and bool(FARM_SUBJECT_PATTERN.search(question)) \
+        and not SPECIFIC_ENTITY_PATTERN.search(question) and not NUMBERED_ENTITY_PATTERN.search(question)
+
+
+def farm_summaries(farm_id: str = None):
+    return [with_activity(s, FARM_ACTIVE_HOURS) for s in get_farm_summaries(farm_id)]
+
+
+def summary_context():
+    """
+    Retrieval dict (same shape as search_and_expand) built from the farm
+    summaries, or None when no summaries exist yet.
+    """
+    summaries = farm_summaries()
+    if not summaries:
+        return None
+    facts = [fact for s in summaries for fact in summary_facts(s)]
+    return {"nodes": [], "facts": facts, "text_context": "\n".join(facts)}
+
+
+def summary_retrieval(question: str):
+    """summary_context() for aggregate questions, None for everything else."""
+    return summary_context() if is_aggregate_question(question) else None
@@ -1,6 +1,33 @@
+import os
+import threading
+
 from django.apps import AppConfig
 
 
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        # Opt-in, so management commands and tests never touch Neo4j/OpenAI.
+        if os.getenv("PROVATO_WARMUP") == "1":
+            threading.Thread(target=warm_up, name="provato-warmup", daemon=True).start()
+
+        # Readings spilled by a previous (crashed or restarted) process are
+        # replayed at startup rather than on the next /ingest/ POST.
+        from . import ingest
+        if os.getenv("INGEST_REPLAY_ON_START", "1") == "1" and ingest.serving() and ingest.has_spilled_readings():
+            ingest.get_buffer()
+
+
+def warm_up():
+    """Warm the Neo4j pool and query plans, then the OpenAI connection."""
+    from .graph import neo4j_connector
+    from . import llm
+
+    for name, step in (("Neo4j", neo4j_connector.warm_up), ("OpenAI", llm.warm_up)):
+        try:
+            step()
+            print(f"{name} warm-up done.")
+        except Exception as e:
+            print(f"{name} warm-up failed:", e)
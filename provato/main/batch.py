@@ -0,0 +1,122 @@
+"""
+Answer many chat questions at once: duplicates are collapsed, each distinct
+question runs its plan -> retrieval -> answer pipeline on a bounded thread
+pool, and questions that resolve to the same Cypher share one Neo4j
+retrieval (but each falls back to expanding its own text).
+"""
+import contextvars
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .aggregates import is_aggregate_question, summary_context
+from .graph.neo4j_connector import retrieve_context
+from .llm import call_llm, extract_search_plan
+
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "8"))
+CHAT_BATCH_MAX_QUESTIONS = int(os.getenv("CHAT_BATCH_MAX_QUESTIONS", "100"))
+
+
+def normalize_question(question: str) -> str:
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!.;").strip().lower()
+
+
+class _SharedRetrievals:
+    """First caller for a key runs the retrieval; concurrent callers wait on its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def get(self, key, fetch):
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = Future()
+        if owner:
+            try:
+                future.set_result(fetch())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result(), not owner
+
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def answer_batch(questions, concurrency: int = CHAT_BATCH_CONCURRENCY):
+    """
+    Returns one result dict per input question, in input order.
+    Repeated questions (after normalization) point at the first occurrence
+    via "duplicate_of" and reuse its answer.
+    """
+    distinct = {}
+    for question in questions:
+        distinct.setdefault(normalize_question(question), question)
+
+    shared = _SharedRetrievals()
+
+    def pipeline(question):
+        timings = {}
+        start = time.perf_counter()
+        retrieval = None
+        if is_aggregate_question(question):
+            retrieval, reused = shared.get("farm_summary", summary_context)
+        if retrieval is not None:
+            plan = {"route": "farm_summary"}
+            timings["retrieval_ms"] = _ms(start)
+        else:
+            plan = extract_search_plan(question)
+            timings["plan_ms"] = _ms(start)
+
+            cypher = plan.get("cypher")
+            start = time.perf_counter()
+            if plan.get("route") == "farm_summary":
+                retrieval, reused = shared.get("farm_summary", summary_context)
+            if retrieval is None:
+                retrieval, reused = retrieve_context(cypher, question, shared.get)
+            timings["retrieval_ms"] = _ms(start)
+
+        start = time.perf_counter()
+        answer_payload = call_llm(question, retrieval.get("text_context", ""),
+                                  [{"role": "user", "content": question}])
+        timings["answer_ms"] = _ms(start)
+        timings["total_ms"] = round(sum(timings.values()), 1)
+
+        return {
+            "question": question,
+            "answer": answer_payload["answer"],
+            "source": answer_payload["source"],
+            "facts_count": len(retrieval.get("facts", [])),
+            "plan": plan,
+            "retrieval_shared": reused,
+            "timings": timings,
+        }
+
+    def run(question):
+        try:
+            return pipeline(question)
+        except Exception as e:
+            return {"question": question, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        # Each task gets a copy of the request context so its spans still
+        # show up in the request's Server-Timing header.
+        futures = {key: pool.submit(contextvars.copy_context().run, run, question)
+                   for key, question in distinct.items()}
+        answered = {key: future.result() for key, future in futures.items()}
+
+    results, seen = [], set()
+    for question in questions:
+        key = normalize_question(question)
+        result = dict(answered[key])
+        if key in seen:
+            result["question"] = question
+            result["duplicate_of"] = distinct[key]
+        seen.add(key)
+        results.append(result)
+    return results
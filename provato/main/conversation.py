@@ -0,0 +1,152 @@
+"""
+Bounded chat memory kept in the Django cache (not the session database).
+
+A conversation holds the most recent turns verbatim, a rolling summary of
+older ones, the entities already resolved, and the last few retrieval
+results keyed by their Cypher, all under CHAT_TOKEN_BUDGET.
+"""
+import os
+import time
+import uuid
+
+from django.core.cache import cache
+
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "1500"))
+CHAT_RECENT_TURNS = int(os.getenv("CHAT_RECENT_TURNS", "6"))
+CHAT_TTL_SECONDS = int(os.getenv("CHAT_TTL_SECONDS", "3600"))
+CHAT_CACHED_RETRIEVALS = int(os.getenv("CHAT_CACHED_RETRIEVALS", "3"))
+CHAT_RETRIEVAL_TTL_SECONDS = int(os.getenv("CHAT_RETRIEVAL_TTL_SECONDS", "300"))
+CHAT_MAX_CACHED_CONTEXT = 20000  # characters; larger retrievals are not kept
+CHAT_MAX_ENTITIES = 20
+
+COOKIE_NAME = "provato_chat"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return len(text or "") // 4 + 1
+
+
+class Conversation:
+    def __init__(self, conversation_id: str, data: dict = None):
+        data = data or {}
+        self.id = conversation_id
+        self.turns = data.get("turns", [])
+        self.summary = data.get("summary", "")
+        self.entities = data.get("entities", {})
+        self.retrievals = data.get("retrievals", [])
+
+    def to_dict(self) -> dict:
+        return {"turns": self.turns, "summary": self.summary,
+                "entities": self.entities, "retrievals": self.retrievals}
+
+    # ---- reading ----
+    def history(self):
+        return [{"role": t["role"], "content": t["content"]} for t in self.turns]
+
+    def planning_context(self) -> str:
+        """What the planner needs to resolve follow-ups like 'and her temperature?'."""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary: {self.summary}")
+        if self.entities:
+            parts.append("Known entities: " + "; ".join(
+                f"{name} (elementId {node_id})" for node_id, name in self.entities.items()))
+        for turn in self.turns:
+            parts.append(f"{turn['role']}: {turn['content']}")
+            if turn.get("cypher"):
+                parts.append(f"(query used: {turn['cypher']})")
+        return "\n".join(parts)
+
+    def cached_retrieval(self, key: str):
+        for entry in self.retrievals:
+            if entry["key"] == key and time.time() - entry["at"] < CHAT_RETRIEVAL_TTL_SECONDS:
+                return entry["retrieval"]
+        return None
+
+    def retrieval(self, key: str, fetch):
+        """(retrieval, reused): a recent retrieval for key, or fetch() remembered under it."""
+        retrieval = self.cached_retrieval(key)
+        if retrieval is not None:
+            return retrieval, True
+        retrieval = fetch()
+        self.remember_retrieval(key, retrieval)
+        return retrieval, False
+
+    # ---- writing ----
+    def remember_retrieval(self, key: str, retrieval: dict):
+        if not key or retrieval.get("error") or len(retrieval.get("text_context", "")) > CHAT_MAX_CACHED_CONTEXT:
+            return
+        self.retrievals = [e for e in self.retrievals if e["key"] != key]
+        self.retrievals.append({"key": key, "at": time.time(), "retrieval": {
+            "nodes": retrieval.get("nodes", []),
+            "facts": retrieval.get("facts", []),
+            "text_context": retrieval.get("text_context", ""),
+        }})
+        self.retrievals = self.retrievals[-CHAT_CACHED_RETRIEVALS:]
+
+    def remember_entities(self, nodes):
+        for node in nodes or []:
+            if node.get("neo4j_id"):
+                self.entities.pop(node["neo4j_id"], None)
+                self.entities[node["neo4j_id"]] = f"{node.get('display_name')} ({'|'.join(node.get('labels', []))})"
+        while len(self.entities) > CHAT_MAX_ENTITIES:
+            self.entities.pop(next(iter(self.entities)))
+
+    def add_turn(self, question: str, answer: str, cypher: str = None):
+        self.turns.append({"role": "user", "content": question})
+        self.turns.append({"role": "assistant", "content": answer, "cypher": cypher})
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.planning_context())
+
+    def _over_budget(self) -> bool:
+        return len(self.turns) > CHAT_RECENT_TURNS * 2 or self.tokens() > CHAT_TOKEN_BUDGET
+
+    def fit_budget(self, summarize):
+        """
+        Once the recent-turn limit or the token budget is exceeded, fold the
+        oldest turns into the summary in one chunk, keeping about half of
+        CHAT_RECENT_TURNS, so summarize() runs every few turns rather than on
+        every turn past the limit. `summarize(summary, turns) -> str`, or None
+        when it failed: the summary is then left as it was and the turns are
+        kept for the next attempt, up to twice the recent-turn limit.
+        """
+        if not self._over_budget():
+            return
+        keep = max(1, CHAT_RECENT_TURNS // 2) * 2
+        evicted = self.turns[:-keep]
+        self.turns = self.turns[-keep:]
+        while len(self.turns) > 2 and self.tokens() > CHAT_TOKEN_BUDGET:
+            evicted += self.turns[:2]
+            self.turns = self.turns[2:]
+        if evicted:
+            summary = summarize(self.summary, evicted)
+            if summary is None:
+                self.turns = (evicted + self.turns)[-CHAT_RECENT_TURNS * 4:]
+                return
+            self.summary = summary
+        # Last resort if the summary itself outgrew the budget.
+        max_chars = CHAT_TOKEN_BUDGET * 2
+        if len(self.summary) > max_chars:
+            self.summary = self.summary[-max_chars:]
+
+
+def _cache_key(conversation_id: str) -> str:
+    return f"chat:{conversation_id}"
+
+
+def load_conversation(request) -> Conversation:
+    conversation_id = request.GET.get("conversation") or request.COOKIES.get(COOKIE_NAME)
+    if conversation_id:
+        data = cache.get(_cache_key(conversation_id))
+        if data is not None:
+            return Conversation(conversation_id, data)
+    return Conversation(uuid.uuid4().hex)
+
+
+def save_conversation(conversation: Conversation, response=None):
+    cache.set(_cache_key(conversation.id), conversation.to_dict(), CHAT_TTL_SECONDS)
+    if response is not None:
+        response.set_cookie(COOKIE_NAME, conversation.id, max_age=CHAT_TTL_SECONDS,
+                            httponly=True, samesite="Lax")
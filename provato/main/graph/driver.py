@@ -0,0 +1,47 @@
+"""
+Shared, lazily created Neo4j driver. Nothing connects at import time;
+the first get_driver() call builds the driver and its connection pool.
+"""
+import os
+import threading
+
+from neo4j import GraphDatabase
+
+NEO4J_URI = os.getenv("NEO4J_URI", "neo4j+ssc://53ed6a0b.databases.neo4j.io")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASS = os.getenv("NEO4J_PASS", "")
+NEO4J_DB = os.getenv("NEO4J_DATABASE", "neo4j")
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+NEO4J_ACQUIRE_TIMEOUT = float(os.getenv("NEO4J_ACQUIRE_TIMEOUT", "60"))
+
+_driver = None
+_lock = threading.Lock()
+
+
+def get_driver():
+    global _driver
+    if _driver is None:
+        with _lock:
+            if _driver is None:
+                _driver = GraphDatabase.driver(
+                    NEO4J_URI,
+                    auth=(NEO4J_USER, NEO4J_PASS),
+                    max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+                    connection_acquisition_timeout=NEO4J_ACQUIRE_TIMEOUT,
+                )
+    return _driver
+
+
+def set_driver(driver):
+    """Replace the shared driver (e.g. with a stand-in for benchmarks)."""
+    global _driver
+    with _lock:
+        _driver = driver
+
+
+def close_driver():
+    global _driver
+    with _lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
@@ -0,0 +1,197 @@
+"""
+Precomputed per-farm aggregates.
+
+Writers keep each Animal's latest vitals and alert counters up to date as
+readings arrive, then refresh the FarmSummary node of every farm they touched
+from those per-animal properties (never from the readings). Dashboards and
+aggregate chat questions read one FarmSummary per farm.
+"""
+import json
+from collections import Counter
+from datetime import datetime, timezone
+
+from .series_store import format_ts, parse_ts
+from .version import bump_graph_version
+
+ALERT_KINDS = ("fever", "low_movement")
+
+FARM_ANIMALS = """
+    MATCH (f:Farm)
+    WHERE $farm_ids IS NULL OR f.id IN $farm_ids
+    OPTIONAL MATCH (a:Animal)-[:BELONGS_TO]->(f)
+    OPTIONAL MATCH (d:Device)-[:ATTACHED_TO]->(a)
+    WITH f, a, collect(d.id_api)[0] AS device_id
+    WITH f, collect(CASE WHEN a IS NULL THEN null ELSE {
+        id_api: a.id_api, name: a.name, type: a.type, sex: a.sex, breed: a.breed,
+        device_id: device_id, last_temperature: a.last_temperature,
+        last_activity: a.last_activity, last_seen: a.last_seen,
+        alert_count: a.alert_count, fever_alerts: a.fever_alerts,
+        low_movement_alerts: a.low_movement_alerts
+    } END) AS animals
+    RETURN f.id AS farm_id, properties(f) AS farm, animals
+"""
+
+SAVE_FARM_SUMMARY = """
+    MATCH (f:Farm {id: $farm_id})
+    MERGE (fs:FarmSummary {farm_id: $farm_id})
+    SET fs.data = $data,
+        fs.animals = $animals,
+        fs.updated = datetime()
+    MERGE (fs)-[:SUMMARIZES]->(f)
+"""
+
+
+def _clean(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def build_summary(farm_id, farm: dict, animals) -> dict:
+    """Aggregate one farm from its animals' stored properties."""
+    animals = [{k: _clean(v) for k, v in a.items()} for a in animals if a]
+    by_breed = {}
+    for a in animals:
+        breed = by_breed.setdefault(a.get("breed") or "unknown", Counter())
+        breed[a.get("sex") or "unknown"] += 1
+
+    temperatures = [a["last_temperature"] for a in animals if a.get("last_temperature") is not None]
+    vitals = [{
+        "id_api": a.get("id_api"),
+        "name": a.get("name"),
+        "device_id": a.get("device_id"),
+        "temperature": a.get("last_temperature"),
+        "activity": a.get("last_activity"),
+        "last_seen": a.get("last_seen"),
+        "alerts": a.get("alert_count") or 0,
+    } for a in animals]
+
+    return {
+        "farm_id": farm_id,
+        "farm_name": _clean((farm or {}).get("name")),
+        "animals": len(animals),
+        "by_type": dict(Counter(a.get("type") or "unknown" for a in animals)),
+        "by_sex": dict(Counter(a.get("sex") or "unknown" for a in animals)),
+        "by_breed": dict(Counter(a.get("breed") or "unknown" for a in animals)),
+        "by_breed_sex": {breed: dict(counts) for breed, counts in by_breed.items()},
+        "devices": sum(1 for a in animals if a.get("device_id")),
+        "avg_temperature": round(sum(temperatures) / len(temperatures), 2) if temperatures else None,
+        "last_reading": max((v["last_seen"] for v in vitals if v["last_seen"]), default=None),
+        "alerts": sum(v["alerts"] for v in vitals),
+        "alerts_by_kind": {kind: sum(a.get(f"{kind}_alerts") or 0 for a in animals) for kind in ALERT_KINDS},
+        "vitals": vitals,
+    }
+
+
+def refresh_farm_summaries(tx, farm_ids=None):
+    """Recompute the FarmSummary of the given farms (all farms when None)."""
+    if farm_ids is not None:
+        farm_ids = sorted({str(f) for f in farm_ids if f is not None})
+        if not farm_ids:
+            return
+    result = tx.run(FARM_ANIMALS, farm_ids=farm_ids)
+    rows = [(r["farm_id"], r["farm"], r["animals"]) for r in result]
+    for farm_id, farm, animals in rows:
+        summary = build_summary(farm_id, farm, animals)
+        tx.run(SAVE_FARM_SUMMARY, farm_id=farm_id, data=json.dumps(summary), animals=summary["animals"])
+
+
+def refresh_device_farms(tx, device_ids):
+    """Refresh the summaries of the farms the given devices' (id_api) animals belong to."""
+    result = tx.run("""
+        MATCH (d:Device)-[:ATTACHED_TO]->(:Animal)-[:BELONGS_TO]->(f:Farm)
+        WHERE d.id_api IN $ids
+        RETURN DISTINCT f.id AS farm_id
+    """, ids=sorted(device_ids))
+    refresh_farm_summaries(tx, [r["farm_id"] for r in result])
+
+
+def rebuild_farm_summaries(session):
+    """
+    One-off backfill for graphs loaded before summaries existed: recount alerts
+    and take the latest reading per animal (from DeviceData, or from the
+    series store when one is configured), then refresh every farm and bump
+    the graph version so cached summary responses are not served again.
+    """
+    from .series_store import DEVICE_DATA, get_store, record_to_row
+    from .telemetry import save_latest_vitals
+
+    session.run("""
+        MATCH (a:Animal)
+        OPTIONAL MATCH (al:Alert)-[:ABOUT]->(a)
+        WITH a, count(al) AS total,
+             count(CASE WHEN al.kind = 'fever' THEN 1 END) AS fever,
+             count(CASE WHEN al.kind = 'low_movement' THEN 1 END) AS low_movement
+        SET a.alert_count = total,
+            a.fever_alerts = fever,
+            a.low_movement_alerts = low_movement
+    """)
+    session.run("""
+        MATCH (a:Animal)<-[:ATTACHED_TO]-(d:Device)
+        CALL {
+            WITH d
+            MATCH (dd:DeviceData)-[:FROM_DEVICE]->(d)
+            RETURN dd ORDER BY dd.created DESC LIMIT 1
+        }
+        SET a.last_temperature = dd.temperature,
+            a.last_activity = round(sqrt(dd.std_x ^ 2 + dd.std_y ^ 2 + dd.std_z ^ 2), 1),
+            a.last_seen = dd.created,
+            d.last_seen = dd.created
+    """)
+    store = get_store()
+    if store is not None:
+        latest = [dict(record_to_row(DEVICE_DATA, record), id_api=device_id)
+                  for device_id in store.sources(DEVICE_DATA)
+                  for record in store.latest(DEVICE_DATA, device_id, 1)]
+        session.execute_write(save_latest_vitals, latest)
+
+    def refresh_all(tx):
+        refresh_farm_summaries(tx)
+        bump_graph_version(tx)
+    session.execute_write(refresh_all)
+
+
+def _seen_since(last_seen, cutoff: float) -> bool:
+    try:
+        return bool(last_seen) and parse_ts(last_seen) >= cutoff
+    except ValueError:
+        return False
+
+
+def with_activity(summary: dict, active_hours: float, now: datetime = None) -> dict:
+    """
+    Add the activity figures that depend on the current time: devices and
+    animals heard from within active_hours, and their mean temperature.
+    Timestamps are compared as UTC instants, whatever form they were stored in.
+    """
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    cutoff = now.timestamp() - active_hours * 3600
+    recent = [v for v in summary.get("vitals", []) if _seen_since(v.get("last_seen"), cutoff)]
+    temperatures = [v["temperature"] for v in recent if v.get("temperature") is not None]
+    return dict(
+        summary,
+        active_since=format_ts(cutoff),
+        active_devices=sum(1 for v in recent if v.get("device_id")),
+        active_avg_temperature=round(sum(temperatures) / len(temperatures), 2) if temperatures else None,
+    )
+
+
+def summary_facts(summary: dict) -> list:
+    """Flatten one farm summary into LLM context lines."""
+    name = summary.get("farm_name") or f"Farm {summary.get('farm_id')}"
+    facts = [
+        f"{name} (Farm {summary.get('farm_id')}): {summary.get('animals', 0)} animals, "
+        f"{summary.get('devices', 0)} devices, {summary.get('active_devices', 0)} active since "
+        f"{summary.get('active_since')}",
+        f"{name} animals by type: {summary.get('by_type')}",
+        f"{name} animals by sex: {summary.get('by_sex')}",
+        f"{name} animals by breed and sex: {summary.get('by_breed_sex')}",
+        f"{name} average latest body temperature: {summary.get('avg_temperature')} "
+        f"(active animals: {summary.get('active_avg_temperature')}); last reading {summary.get('last_reading')}",
+        f"{name} alerts: {summary.get('alerts', 0)} total, by kind {summary.get('alerts_by_kind')}",
+    ]
+    alerted = sorted((v for v in summary.get("vitals", []) if v.get("alerts")), key=lambda v: -v["alerts"])
+    if alerted:
+        facts.append(f"{name} animals with most alerts: " + ", ".join(
+            f"{v['name']} ({v['id_api']}): {v['alerts']}" for v in alerted[:5]))
+    return facts
@@ -1,12 +1,14 @@
-from neo4j import GraphDatabase
+import json
 import os
 
+from neo4j.exceptions import DriverError, Neo4jError
+from neo4j.graph import Node
 
-NEO4J_URI = os.getenv("NEO4J_URI", "neo4j+ssc://53ed6a0b.databases.neo4j.io")
-NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
-NEO4J_PASS = os.getenv("NEO4J_PASS", "")
-NEO4J_DB = os.getenv("NEO4J_DATABASE", "neo4j")
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASS))
+from ..metrics import span
+from .driver import NEO4J_DB, get_driver
+from .series_store import DEVICE_DATA, METEO_DATA, TIME_FIELD, get_store, record_to_row
+
+NEO4J_WARMUP_CONNECTIONS = int(os.getenv("NEO4J_WARMUP_CONNECTIONS", "4"))
 
 
 # --------------------- Universal Search ---------------------
@@ -15,7 +17,7 @@ def universal_search(query: str, limit: int = 20):
     Search all nodes using the fulltext index 'everythingIndex'.
     Returns basic node data (id, labels, properties, score).
     """
-    with driver.session(database=NEO4J_DB) as session:
+    with span("neo4j_search") as s, get_driver().session(database=NEO4J_DB) as session:
         result = session.run("""
             CALL db.index.fulltext.queryNodes("everythingIndex", $q)
             YIELD node, score
@@ -43,6 +45,7 @@ def universal_search(query: str, limit: int = 20):
                 "score": record["score"],
                 "display_name": display_name,
             })
+        s.add("neo4j_rows", len(data))
         return data
 
 
@@ -54,7 +57,7 @@ def get_suggestions(partial: str):
     if not partial:
         return []
 
-    with driver.session(database=NEO4J_DB) as session:
+    with span("neo4j_suggest") as s, get_driver().session(database=NEO4J_DB) as session:
         result = session.run("""
             MATCH (n)
             WHERE any(key IN ['name','tag','breed','owner']
@@ -64,12 +67,14 @@ def get_suggestions(partial: str):
             ORDER BY suggestion
             LIMIT 10
         """, {"partial": partial.lower()})
-        return [r["suggestion"] for r in result if r["suggestion"]]
+        suggestions = [r["suggestion"] for r in result if r["suggestion"]]
+        s.add("neo4j_rows", len(suggestions))
+        return suggestions
 
 
 # --------------------- Single Node Lookup ---------------------
 def get_node_by_id(node_id: str):
-    with driver.session(database=NEO4J_DB) as session:
+    with span("neo4j_node"), get_driver().session(database=NEO4J_DB) as session:
         result = session.run("""
             MATCH (n)
             WHERE elementId(n) = $id
@@ -89,7 +94,7 @@ def get_node_by_id(node_id: str):
 
 # --------------------- Relationships ---------------------
 def get_node_with_rels(node_id: str):
-    with driver.session(database=NEO4J_DB) as session:
+    with span("neo4j_rels") as s, get_driver().session(database=NEO4J_DB) as session:
         result = session.run("""
             MATCH (n)-[r]-(m)
             WHERE elementId(n) = $id
@@ -109,6 +114,7 @@ def get_node_with_rels(node_id: str):
                 "related_labels": record["related_labels"],
                 "display_name": display_name,
             })
+        s.add("neo4j_rows", len(rels))
         return rels
 
 
@@ -126,7 +132,7 @@ def search_and_expand(question: str, top_k: int = 5, neighbor_limit: int = 15):
 
     facts, nodes_out = [], []
 
-    with driver.session(database=NEO4J_DB) as session:
+    with span("neo4j_expand") as s, get_driver().session(database=NEO4J_DB) as session:
         for hit in hits:
             node_id = hit["neo4j_id"]
             node_labels = hit["labels"]
@@ -156,6 +162,7 @@ def search_and_expand(question: str, top_k: int = 5, neighbor_limit: int = 15):
             """, {"id": node_id, "limit": neighbor_limit})
 
             for r in rel_result:
+                s.add("neo4j_rows", 1)
                 rel_type = r["rel_type"]
                 related_labels = r["related_labels"] or []
                 related_props = r["related_props"] or {}
@@ -204,7 +211,7 @@ def precise_lookup(plan: dict, limit: int = 5, neighbor_limit: int = 20):
 
     where_clause = " AND ".join(conditions)
 
-    with driver.session(database=NEO4J_DB) as session:
+    with span("neo4j_lookup") as s, get_driver().session(database=NEO4J_DB) as session:
         main_query = f"""
         MATCH (n)
         WHERE {where_clause}
@@ -216,6 +223,7 @@ def precise_lookup(plan: dict, limit: int = 5, neighbor_limit: int = 20):
         nodes_out, facts = [], []
 
         for record in result:
+            s.add("neo4j_rows", 1)
             node_id = record["neo4j_id"]
             node_labels = record["labels"]
             props = record["props"] or {}
@@ -242,6 +250,7 @@ def precise_lookup(plan: dict, limit: int = 5, neighbor_limit: int = 20):
             """, {"id": node_id, "limit": neighbor_limit})
 
             for rel in rels:
+                s.add("neo4j_rows", 1)
                 rel_type = rel["rel_type"]
                 related_name = rel["related_props"].get("name") or rel["related_props"].get("tag") or "(Unnamed)"
                 facts.append(f"{display_name} -[{rel_type}]- {related_name}")
@@ -253,14 +262,309 @@ def precise_lookup(plan: dict, limit: int = 5, neighbor_limit: int = 20):
         }
 
 def run_generated_cypher(cypher: str, limit: int = 100):
-    with driver.session(database=NEO4J_DB) as session:
+    with get_driver().session(database=NEO4J_DB) as session:
         try:
-            result = session.run(cypher)
+            with span("neo4j_cypher", cypher):
+                result = session.run(cypher)
+                # Records stream lazily; peeking forces the first round trip
+                # so query time and result consumption are reported apart.
+                result.peek()
         except Exception as e:
             return {"error": str(e), "facts": [], "text_context": ""}
 
-        facts = []
-        for r in result:
-            for k, v in r.items():
-                facts.append(f"{k}: {v}")
-        return {"facts": facts, "text_context": "\n".join(facts)}
+        facts, nodes_out = [], {}
+        with span("neo4j_consume", cypher) as c:
+            for r in result:
+                c.add("neo4j_rows", 1)
+                for k, v in r.items():
+                    facts.append(f"{k}: {v}")
+                    for node in (v if isinstance(v, list) else [v]):
+                        if isinstance(node, Node) and len(nodes_out) < limit:
+                            nodes_out[node.element_id] = _node_out(node)
+        return {"nodes": list(nodes_out.values()), "facts": facts, "text_context": "\n".join(facts)}
+
+
+def _node_out(node):
+    """A returned Node in the same shape as the search functions' nodes."""
+    props = dict(node)
+    return {
+        "neo4j_id": node.element_id,
+        "labels": list(node.labels),
+        "props": props,
+        "display_name": props.get("name") or props.get("tag") or "(Unnamed)",
+    }
+
+
+# --------------------- Graph Version ---------------------
+def get_graph_version() -> int:
+    """Counter bumped by every writer (see graph/version.py); 0 before the first write."""
+    with span("neo4j_version"), get_driver().session(database=NEO4J_DB) as session:
+        record = session.run("""
+            MATCH (v:GraphVersion {id: 'graph'})
+            RETURN v.version AS version
+        """).single()
+        return record["version"] if record and record["version"] is not None else 0
+
+
+# --------------------- Alerts ---------------------
+def get_alerted_animals(since: str = None, kind: str = None, limit: int = 50):
+    """
+    Animals with Alert nodes raised by the ingest-time anomaly detector.
+    Uses the Alert indexes instead of scanning DeviceData readings.
+    """
+    with span("neo4j_alerts") as s, get_driver().session(database=NEO4J_DB) as session:
+        result = session.run("""
+            MATCH (al:Alert)
+            WHERE ($since IS NULL OR al.created >= $since)
+              AND ($kind IS NULL OR al.kind = $kind)
+            MATCH (al)-[:ABOUT]->(a:Animal)
+            WITH a, count(al) AS alert_count, max(al.created) AS last_alert,
+                 collect(DISTINCT al.kind) AS kinds
+            RETURN elementId(a) AS neo4j_id, properties(a) AS props,
+                   alert_count, last_alert, kinds
+            ORDER BY last_alert DESC
+            LIMIT $limit
+        """, {"since": since, "kind": kind, "limit": limit})
+
+        animals = []
+        for record in result:
+            props = record["props"] or {}
+            animals.append({
+                "neo4j_id": record["neo4j_id"],
+                "props": props,
+                "display_name": props.get("name") or props.get("tag") or "(Unnamed)",
+                "alert_count": record["alert_count"],
+                "last_alert": record["last_alert"],
+                "kinds": record["kinds"],
+            })
+        s.add("neo4j_rows", len(animals))
+        return animals
+
+
+# --------------------- Farm Summaries ---------------------
+def get_farm_summaries(farm_id: str = None):
+    """Precomputed FarmSummary aggregates (see graph/farm_summary.py), one per farm."""
+    with span("neo4j_farm_summary") as s, get_driver().session(database=NEO4J_DB) as session:
+        result = session.run("""
+            MATCH (fs:FarmSummary)
+            WHERE $farm_id IS NULL OR fs.farm_id = $farm_id
+            RETURN fs.data AS data
+            ORDER BY fs.farm_id
+        """, {"farm_id": farm_id})
+        summaries = [json.loads(record["data"]) for record in result if record["data"]]
+        s.add("neo4j_rows", len(summaries))
+        return summaries
+
+
+# --------------------- Stored Series ---------------------
+def get_latest_readings(kind: str, source_id: str, n: int = 3):
+    """
+    Latest n readings of one Device (DEVICE_DATA, by id_api) or Farm
+    (METEO_DATA, by id_api) from the columnar series store, newest first.
+    Empty when no store is configured.
+    """
+    store = get_store()
+    if store is None or not source_id:
+        return []
+    with span("series_latest") as s:
+        rows = [record_to_row(kind, record) for record in store.latest(kind, source_id, n)][::-1]
+        s.add("series_rows", len(rows))
+        return rows
+
+
+# --------------------- Warm-up ---------------------
+def warm_up(connections: int = NEO4J_WARMUP_CONNECTIONS):
+    """
+    Open pool connections and run the hot queries once (fulltext search,
+    node lookup, neighbour expansion) so the first real request finds warm
+    connections and cached query plans.
+    """
+    driver = get_driver()
+    driver.verify_connectivity()
+
+    # Keep every session's result open until all have run, so each one
+    # holds (and therefore opens) its own pooled connection.
+    sessions = [driver.session(database=NEO4J_DB) for _ in range(max(1, connections))]
+    try:
+        for session in sessions:
+            session.run("RETURN 1")
+    finally:
+        for session in sessions:
+            session.close()
+
+    hits = universal_search("warmup", limit=1)
+    node_id = hits[0]["neo4j_id"] if hits else "warmup"
+    get_node_by_id(node_id)
+    get_node_with_rels(node_id)
+    search_and_expand("warmup", top_k=1, neighbor_limit=1)
+    get_graph_version()
+
+
+# --------------------- Ranked Multi-hop Context ---------------------
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "one_hop")
+
+REL_WEIGHTS = {
+    "BELONGS_TO": 1.0,
+    "ATTACHED_TO": 0.9,
+    "ABOUT": 0.9,
+    "FROM_DEVICE": 0.8,
+    "SERIES_OF": 0.6,
+    "FROM_FARM": 0.5,
+    "CLOSE_TO": 0.4,
+    "TRIGGERED_BY": 0.3,
+}
+DEFAULT_REL_WEIGHT = 0.5
+HOP_DECAY = 0.7          # per extra hop
+RECENCY_DECAY = 0.8      # per older reading of the same device/farm
+DEGREE_PENALTY = 0.25    # damps hubs: score / (1 + penalty * log10(1 + degree))
+LATEST_READINGS = 3      # readings kept per reached Device/Farm
+
+# Readings are never expanded through; instead each reached Device/Farm
+# contributes its latest few, so large histories are never enumerated.
+RANKED_EXPANSION = """
+MATCH (s) WHERE elementId(s) IN $ids
+CALL {
+    WITH s
+    MATCH p = (s)-[*1..%(hops)d]-(m)
+    WHERE m <> s AND none(x IN nodes(p)[1..] WHERE x:DeviceData OR x:MeteoData)
+    WITH m, p, reduce(w = 1.0, r IN relationships(p) | w * coalesce($weights[type(r)], $default_weight))
+               * ($hop_decay ^ (length(p) - 1)) AS path_score
+    ORDER BY path_score DESC
+    WITH m, collect(p)[0] AS best, max(path_score) AS path_score
+    RETURN m, [r IN relationships(best) | type(r)] AS via, path_score
+    UNION
+    WITH s
+    RETURN s AS m, [] AS via, 1.0 AS path_score
+}
+CALL {
+    WITH m, via, path_score
+    WITH m, via, path_score, COUNT { (m)--() } AS degree
+    RETURN m AS fact, via AS fact_via, path_score / (1.0 + $degree_penalty * log10(1 + degree)) AS score
+    UNION
+    WITH m, via, path_score
+    MATCH (m)<-[rel:FROM_DEVICE|FROM_FARM]-(r)
+    WHERE r:DeviceData OR r:MeteoData
+    WITH r, type(rel) AS rel_type, via, path_score
+    ORDER BY coalesce(r.created, r.station_timedata) DESC
+    LIMIT $latest
+    WITH rel_type, via, path_score, collect(r) AS readings
+    UNWIND range(0, size(readings) - 1) AS i
+    RETURN readings[i] AS fact, via + [rel_type] AS fact_via,
+           path_score * coalesce($weights[rel_type], $default_weight) * ($recency_decay ^ i) AS score
+}
+WITH s, fact, fact_via, score
+WHERE fact <> s
+ORDER BY score DESC
+WITH fact, collect({seed: s, via: fact_via, score: score})[0] AS best
+ORDER BY best.score DESC
+LIMIT $budget
+RETURN elementId(fact) AS neo4j_id, labels(fact) AS labels, properties(fact) AS props,
+       best.score AS score, best.via AS via, elementId(best.seed) AS seed_id
+"""
+
+
+def search_and_expand_ranked(question: str, top_k: int = 5, hops: int = 3, budget: int = 40):
+    """
+    Like search_and_expand, but expands up to `hops` hops from the fulltext
+    hits and keeps only the `budget` best neighbours, ranked inside Neo4j by
+    relationship-type weights, hop distance, node degree and reading recency.
+    """
+    hits = universal_search(question, limit=top_k)
+    if not hits:
+        return {"nodes": [], "facts": [], "text_context": ""}
+
+    hops = max(1, min(int(hops), 3))
+    facts, nodes_out = [], []
+    seeds = {}
+    for hit in hits:
+        seeds[hit["neo4j_id"]] = hit
+        nodes_out.append({k: hit[k] for k in ("neo4j_id", "labels", "props", "display_name")})
+        for k, v in hit["props"].items():
+            facts.append(f"{hit['display_name']} ({'|'.join(hit['labels'])}): {k} = {v}")
+
+    query = RANKED_EXPANSION % {"hops": hops}
+    with span("neo4j_expand_ranked", query) as s, get_driver().session(database=NEO4J_DB) as session:
+        result = session.run(query, {
+            "ids": list(seeds),
+            "weights": REL_WEIGHTS,
+            "default_weight": DEFAULT_REL_WEIGHT,
+            "hop_decay": HOP_DECAY,
+            "recency_decay": RECENCY_DECAY,
+            "degree_penalty": DEGREE_PENALTY,
+            "latest": LATEST_READINGS,
+            "budget": budget,
+        })
+        records = list(result)
+        s.add("neo4j_rows", len(records))
+
+    for record in records:
+        facts.extend(_ranked_facts(seeds[record["seed_id"]]["display_name"], record))
+        facts.extend(_stored_reading_facts(record))
+
+    return {"nodes": nodes_out, "facts": facts, "text_context": "\n".join(facts)}
+
+
+def _ranked_facts(seed_name, record):
+    labels = record["labels"] or []
+    props = record["props"] or {}
+    name = props.get("name") or props.get("tag") or props.get("created") or props.get("station_timedata") \
+        or props.get("id") or "(Unnamed)"
+    out = [f"{seed_name} -[{'>'.join(record['via'])}]-> {name} ({'|'.join(labels)})"]
+    out += [f"{name}: {k} = {v}" for k, v in props.items()]
+    return out
+
+
+SERIES_SOURCES = {"Device": (DEVICE_DATA, "FROM_DEVICE"), "Farm": (METEO_DATA, "FROM_FARM")}
+
+
+def _stored_reading_facts(record):
+    """
+    Readings kept in the series store rather than the graph: a reached
+    Device/Farm contributes its latest LATEST_READINGS from there.
+    """
+    labels = record["labels"] or []
+    props = record["props"] or {}
+    for label, (kind, rel_type) in SERIES_SOURCES.items():
+        if label not in labels:
+            continue
+        name = props.get("name") or props.get("id_api") or "(Unnamed)"
+        out = []
+        for row in get_latest_readings(kind, props.get("id_api"), LATEST_READINGS):
+            when = row.pop(TIME_FIELD[kind])
+            out.append(f"{name} -[{rel_type}]-> {when} (stored reading)")
+            out += [f"{when}: {k} = {v}" for k, v in row.items() if v is not None]
+        return out
+    return []
+
+
+def expand_question(question: str):
+    """
+    Context retrieval used when there is no usable generated Cypher (see
+    RETRIEVAL_MODE). A failing ranked query falls back to one-hop expansion.
+    """
+    if RETRIEVAL_MODE == "ranked":
+        try:
+            return search_and_expand_ranked(question)
+        except (Neo4jError, DriverError) as e:
+            print("Ranked retrieval failed, using one-hop expansion:", e)
+    return search_and_expand(question)
+
+
+def _uncached(key, fetch):
+    return fetch(), False
+
+
+def retrieve_context(cypher: str, question: str, cached=_uncached):
+    """
+    Run the planner's Cypher; when there is none, or it fails or finds
+    nothing, expand the question from full-text matches instead.
+    Returns (retrieval, reused). `cached(key, fetch) -> (value, reused)` lets
+    callers share results: Cypher results are keyed by the query, expansions
+    by "search:<question>", so questions sharing a query never share an
+    expansion.
+    """
+    if cypher:
+        retrieval, reused = cached(cypher, lambda: run_generated_cypher(cypher))
+        if not retrieval.get("error") and retrieval.get("facts"):
+            return retrieval, reused
+    return cached(f"search:{question}", lambda: expand_question(question))
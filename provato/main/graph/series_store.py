@@ -0,0 +1,323 @@
+"""
+Optional columnar side store for raw DeviceData and MeteoData series.
+
+Readings are appended to fixed-width binary files, one per source and day:
+
+    <SERIES_STORE_PATH>/<kind>/<source_id>/<YYYY-MM-DD>.bin
+
+Each file is a flat array of a NumPy structured dtype, so reads are a
+np.memmap plus a searchsorted on the timestamp column, and the slices
+handed back are views on the mapped file rather than copies.
+The graph keeps one SeriesDay rollup node per file, pointing at it.
+Writers (the CSV uploader, the server's ingest writer) may share a store:
+appends to one source are serialized by a lock file in its folder.
+
+Enabled by setting SERIES_STORE_PATH; requires numpy.
+"""
+import os
+import re
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single writer per store
+    fcntl = None
+
+SERIES_STORE_PATH = os.getenv("SERIES_STORE_PATH", "")
+
+DEVICE_DATA = "device_data"
+METEO_DATA = "meteo_data"
+
+FIELDS = {
+    DEVICE_DATA: [
+        ("ts", "<i8"), ("id", "<i8"),
+        ("acc_x", "<f4"), ("acc_y", "<f4"), ("acc_z", "<f4"),
+        ("std_x", "<f4"), ("std_y", "<f4"), ("std_z", "<f4"),
+        ("max_x", "<f4"), ("max_y", "<f4"), ("max_z", "<f4"),
+        ("temperature", "<f4"), ("lon", "<f8"), ("lat", "<f8"),
+    ],
+    METEO_DATA: [
+        ("ts", "<i8"),
+        ("temperature", "<f4"), ("humidity", "<f4"), ("wind", "<f4"), ("direction", "<f4"),
+        ("yetos", "<f4"), ("barometer", "<f4"), ("dew_point", "<f4"), ("heat_index", "<f4"),
+        ("wind_chill", "<f4"), ("solar_radiation", "<f4"),
+    ],
+}
+
+TIME_FIELD = {DEVICE_DATA: "created", METEO_DATA: "station_timedata"}
+SOURCE_LABEL = {DEVICE_DATA: ("Device", "id_api"), METEO_DATA: ("Farm", "id_api")}
+
+
+def parse_ts(value) -> int:
+    """'2025-09-15 01:29:17[.ffffff]' (UTC) -> epoch seconds."""
+    dt = datetime.fromisoformat(str(value).strip())
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def format_ts(ts: int) -> str:
+    """Epoch seconds -> 'YYYY-MM-DD HH:MM:SS' (UTC), the form the CSV exports use."""
+    return datetime.fromtimestamp(int(ts), tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def normalize_ts(value):
+    """
+    Any ISO timestamp ('T' separator, offset or 'Z' included) as the canonical
+    UTC 'YYYY-MM-DD HH:MM:SS', so stored timestamps compare correctly as strings.
+    Unparseable values are returned unchanged.
+    """
+    try:
+        return format_ts(parse_ts(value))
+    except ValueError:
+        return value
+
+
+def series_day_id(kind, source_id, day) -> str:
+    """Id of the SeriesDay rollup node for one partition file."""
+    return f"{kind}/{source_id}/{day}"
+
+
+def _num(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _reading_id(value) -> int:
+    """Numeric reading ids are kept; anything else is stored as -1."""
+    number = _num(value)
+    return int(number) if number == number and abs(number) < 2 ** 63 else -1
+
+
+def _lon_lat(coordinates):
+    parts = str(coordinates or "").strip("() ").split(",")
+    if len(parts) != 2:
+        return float("nan"), float("nan")
+    return _num(parts[0]), _num(parts[1])
+
+
+def _safe(source_id) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(source_id).strip())
+
+
+def _dedupe(data):
+    """Drop rows repeating the previous row's timestamp (data must be sorted on ts)."""
+    if len(data) < 2:
+        return data
+    keep = np.ones(len(data), dtype=bool)
+    keep[1:] = data["ts"][1:] != data["ts"][:-1]
+    return data[keep]
+
+
+class SeriesStore:
+    """
+    Time-partitioned store with one sorted, timestamp-unique file per day.
+    In-order readings are plain appends; late ones rewrite their day's file,
+    and readings already stored are dropped, so replays of the ingest spill
+    file are harmless.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def dtype(self, kind):
+        return np.dtype(FIELDS[kind])
+
+    def partition_path(self, kind, source_id, day) -> str:
+        return os.path.join(self.root, kind, _safe(source_id), f"{day}.bin")
+
+    def _open(self, path, kind):
+        dtype = self.dtype(kind)
+        if not os.path.exists(path) or os.path.getsize(path) < dtype.itemsize:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r",
+                         shape=(os.path.getsize(path) // dtype.itemsize,))
+
+    def _last(self, path, kind):
+        # Read from the file every time: another process may have appended.
+        data = self._open(path, kind)
+        return int(data["ts"][-1]) if len(data) else None
+
+    @contextmanager
+    def _locked(self, kind, source_id):
+        folder = os.path.join(self.root, kind, _safe(source_id))
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, ".lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            yield
+
+    def _record(self, kind, row, ts):
+        if kind == DEVICE_DATA:
+            lon, lat = _lon_lat(row.get("coordinates"))
+            values = [ts, _reading_id(row.get("id"))]
+            values += [_num(row.get(name)) for name, _ in FIELDS[kind][2:-2]]
+            return tuple(values + [lon, lat])
+        return tuple([ts] + [_num(row.get(name)) for name, _ in FIELDS[kind][1:]])
+
+    def append(self, kind, source_id, rows):
+        """
+        Append CSV-style row dicts for one source.
+        Returns the partitions written, as dicts for write_rollups().
+        """
+        by_day = {}
+        for row in rows:
+            try:
+                ts = parse_ts(row.get(TIME_FIELD[kind]))
+            except ValueError:
+                continue
+            day = datetime.fromtimestamp(ts, tz=timezone.utc).date().isoformat()
+            by_day.setdefault(day, []).append(self._record(kind, row, ts))
+
+        written = []
+        if not by_day:
+            return written
+        dtype = self.dtype(kind)
+        with self._locked(kind, source_id):
+            for day, records in sorted(by_day.items()):
+                path = self.partition_path(kind, source_id, day)
+                new = _dedupe(np.sort(np.array(records, dtype=dtype), order="ts", kind="stable"))
+                last = self._last(path, kind)
+                if last is None or new["ts"][0] > last:
+                    with open(path, "ab") as f:
+                        f.write(new.tobytes())
+                else:
+                    # Late or replayed readings: merge and rewrite this day's file.
+                    existing = np.array(self._open(path, kind))
+                    merged = np.concatenate([existing, new])
+                    merged = _dedupe(merged[np.argsort(merged["ts"], kind="stable")])
+                    if len(merged) == len(existing):
+                        continue
+                    tmp = path + ".tmp"
+                    with open(tmp, "wb") as f:
+                        f.write(merged.tobytes())
+                    os.replace(tmp, path)
+                written.append({"kind": kind, "source_id": str(source_id), "day": day, "path": path})
+        return written
+
+    def iter_range(self, kind, source_id, start, end, fields=None):
+        """
+        Yield zero-copy slices (memmap views) covering [start, end) for one source.
+        start/end are datetimes or 'YYYY-MM-DD[ HH:MM:SS]' strings.
+        """
+        lo, hi = parse_ts(start), parse_ts(end)
+        folder = os.path.join(self.root, kind, _safe(source_id))
+        if not os.path.isdir(folder):
+            return
+        first_day = datetime.fromtimestamp(lo, tz=timezone.utc).date().isoformat()
+        last_day = datetime.fromtimestamp(hi, tz=timezone.utc).date().isoformat()
+        for name in sorted(os.listdir(folder)):
+            day = name[:-4]
+            if not name.endswith(".bin") or day < first_day or day > last_day:
+                continue
+            data = self._open(os.path.join(folder, name), kind)
+            ts = data["ts"]
+            view = data[np.searchsorted(ts, lo, "left"):np.searchsorted(ts, hi, "left")]
+            if len(view):
+                yield view[fields] if fields else view
+
+    def read_range(self, kind, source_id, start, end, fields=None):
+        """Like iter_range(), concatenated into one (copied) array."""
+        chunks = list(self.iter_range(kind, source_id, start, end, fields))
+        if not chunks:
+            dtype = self.dtype(kind)
+            return np.zeros(0, dtype=dtype[fields] if fields else dtype)
+        return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+    def latest(self, kind, source_id, n: int):
+        """The n most recent records of one source, oldest first, read day by day through iter_range()."""
+        folder = os.path.join(self.root, kind, _safe(source_id))
+        days = sorted((name[:-4] for name in os.listdir(folder) if name.endswith(".bin")), reverse=True) \
+            if os.path.isdir(folder) else []
+        chunks, have = [], 0
+        for day in days:
+            if have >= n:
+                break
+            next_day = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+            data = self.read_range(kind, source_id, day, next_day)
+            chunk = data[max(0, len(data) - (n - have)):]
+            chunks.insert(0, chunk)
+            have += len(chunk)
+        if not chunks:
+            return np.zeros(0, dtype=self.dtype(kind))
+        return np.concatenate(chunks)
+
+    def sources(self, kind):
+        folder = os.path.join(self.root, kind)
+        return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+    def summarize(self, kind, path) -> dict:
+        data = self._open(path, kind)
+        temperature = data["temperature"]
+        return {
+            "rows": int(len(data)),
+            "first_ts": int(data["ts"][0]),
+            "last_ts": int(data["ts"][-1]),
+            "temp_min": float(np.nanmin(temperature)),
+            "temp_max": float(np.nanmax(temperature)),
+            "temp_mean": float(np.nanmean(temperature)),
+        }
+
+
+_store = None
+
+
+def get_store():
+    """Shared SeriesStore, or None when SERIES_STORE_PATH is unset or numpy is missing."""
+    global _store
+    if _store is None and SERIES_STORE_PATH:
+        if np is None:
+            print("SERIES_STORE_PATH is set but numpy is not installed; storing series in the graph.")
+            return None
+        _store = SeriesStore(SERIES_STORE_PATH)
+    return _store
+
+
+def record_to_row(kind, record) -> dict:
+    """A stored record as a CSV-style row: timestamp formatted, NaNs as None."""
+    row = {TIME_FIELD[kind]: format_ts(record["ts"])}
+    for name, _ in FIELDS[kind][1:]:
+        value = record[name].item()
+        if name == "id":
+            row[name] = str(value) if value >= 0 else None
+        elif name not in ("lon", "lat"):
+            row[name] = None if value != value else round(value, 4)
+    if kind == DEVICE_DATA and record["lon"] == record["lon"]:
+        row["coordinates"] = f"({record['lon']:.9f},{record['lat']:.9f})"
+    return row
+
+
+def write_rollups(tx, store: SeriesStore, partitions):
+    """
+    MERGE one SeriesDay node per written partition, linked to its Device or Farm.
+    Stats are recomputed from the whole partition file, so retries are idempotent.
+    """
+    for part in partitions:
+        label, key = SOURCE_LABEL[part["kind"]]
+        tx.run(
+            f"""
+            MERGE (s:SeriesDay {{id: $id}})
+            SET s.kind = $kind,
+                s.source_id = $source_id,
+                s.day = $day,
+                s.path = $path,
+                s += $stats
+            WITH s
+            MATCH (src:{label} {{{key}: $source_id}})
+            MERGE (s)-[:SERIES_OF]->(src)
+            """,
+            id=series_day_id(part["kind"], part["source_id"], part["day"]),
+            kind=part["kind"],
+            source_id=part["source_id"],
+            day=part["day"],
+            path=os.path.relpath(part["path"], store.root),
+            stats=store.summarize(part["kind"], part["path"]),
+        )
@@ -0,0 +1,329 @@
+import math
+import os
+from datetime import datetime, timezone
+
+from .farm_summary import refresh_device_farms
+from .series_store import DEVICE_DATA, normalize_ts, parse_ts, series_day_id, write_rollups
+from .version import bump_graph_version
+
+
+# --------------------- Detector configuration ---------------------
+ALERT_FEVER_TEMP = float(os.getenv("ALERT_FEVER_TEMP", "40.5"))
+ALERT_LOW_ACTIVITY = float(os.getenv("ALERT_LOW_ACTIVITY", "0"))
+ALERT_Z_SCORE = float(os.getenv("ALERT_Z_SCORE", "3.0"))
+ALERT_EWMA_ALPHA = float(os.getenv("ALERT_EWMA_ALPHA", "0.05"))
+ALERT_MIN_SAMPLES = int(os.getenv("ALERT_MIN_SAMPLES", "24"))
+
+
+def _to_float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def acc_magnitude(row: dict) -> float:
+    """
+    Movement magnitude of a reading, from the per-axis standard deviations.
+    The raw acc_x/y/z values are dominated by gravity (collar orientation),
+    so the std components are what actually tracks activity.
+    """
+    return math.sqrt(
+        _to_float(row.get("std_x")) ** 2 +
+        _to_float(row.get("std_y")) ** 2 +
+        _to_float(row.get("std_z")) ** 2
+    )
+
+
+# --------------------- Rolling Statistics ---------------------
+class RollingStats:
+    """
+    Exponentially weighted mean and variance of one signal.
+    Constant memory: three numbers, however many readings have been seen.
+    """
+    __slots__ = ("count", "mean", "var")
+
+    def __init__(self, count=0, mean=0.0, var=0.0):
+        self.count = count
+        self.mean = mean
+        self.var = var
+
+    def zscore(self, x: float):
+        if self.count < ALERT_MIN_SAMPLES or self.var <= 0:
+            return None
+        return (x - self.mean) / math.sqrt(self.var)
+
+    def update(self, x: float):
+        self.count += 1
+        if self.count == 1:
+            self.mean, self.var = x, 0.0
+            return
+        # Plain Welford until the window fills, EWMA afterwards, so the first
+        # readings are not dominated by the initial value.
+        alpha = max(ALERT_EWMA_ALPHA, 1.0 / self.count)
+        delta = x - self.mean
+        self.mean += alpha * delta
+        self.var = (1 - alpha) * (self.var + alpha * delta * delta)
+
+
+class AnomalyDetector:
+    """
+    Streaming fever / low-movement detector keyed by device id.
+    check() scores a reading against the device's history *before* folding
+    it in, so a single spike cannot mask itself.
+    """
+
+    def __init__(self):
+        self._temperature = {}
+        self._activity = {}
+
+    def load_state(self, device_id: str, state: dict):
+        self._temperature[device_id] = RollingStats(
+            int(state.get("temp_count") or 0),
+            _to_float(state.get("temp_mean")),
+            _to_float(state.get("temp_var")),
+        )
+        self._activity[device_id] = RollingStats(
+            int(state.get("acc_count") or 0),
+            _to_float(state.get("acc_mean")),
+            _to_float(state.get("acc_var")),
+        )
+
+    def state(self, device_id: str) -> dict:
+        temp = self._temperature.get(device_id) or RollingStats()
+        acc = self._activity.get(device_id) or RollingStats()
+        return {
+            "temp_count": temp.count, "temp_mean": temp.mean, "temp_var": temp.var,
+            "acc_count": acc.count, "acc_mean": acc.mean, "acc_var": acc.var,
+        }
+
+    def devices(self):
+        return list(self._temperature.keys())
+
+    def fork(self, device_ids):
+        """
+        Independent copy of the given devices' statistics. Score a batch with
+        the fork and absorb() it only after the transaction commits, so a
+        rolled-back batch leaves this detector untouched.
+        """
+        fork = AnomalyDetector()
+        for device_id in device_ids:
+            if device_id in self._temperature:
+                fork.load_state(device_id, self.state(device_id))
+        return fork
+
+    def absorb(self, fork):
+        self._temperature.update(fork._temperature)
+        self._activity.update(fork._activity)
+
+    def check(self, device_id: str, row: dict):
+        """
+        Returns a list of alert dicts for this reading (usually empty).
+        """
+        temp_stats = self._temperature.setdefault(device_id, RollingStats())
+        acc_stats = self._activity.setdefault(device_id, RollingStats())
+
+        temperature = _to_float(row.get("temperature"))
+        activity = acc_magnitude(row)
+        alerts = []
+
+        temp_z = temp_stats.zscore(temperature)
+        if temperature >= ALERT_FEVER_TEMP or (temp_z is not None and temp_z >= ALERT_Z_SCORE):
+            alerts.append(self._alert(row, "fever", temperature, temp_z, temp_stats.mean))
+
+        acc_z = acc_stats.zscore(activity)
+        if (ALERT_LOW_ACTIVITY and acc_stats.count >= ALERT_MIN_SAMPLES and activity <= ALERT_LOW_ACTIVITY) \
+                or (acc_z is not None and acc_z <= -ALERT_Z_SCORE):
+            alerts.append(self._alert(row, "low_movement", activity, acc_z, acc_stats.mean))
+
+        temp_stats.update(temperature)
+        acc_stats.update(activity)
+        return alerts
+
+    @staticmethod
+    def _alert(row, kind, value, zscore, baseline):
+        return {
+            "id": f"{row['id']}:{kind}",
+            "kind": kind,
+            "value": value,
+            "zscore": zscore,
+            "baseline": baseline,
+            "created": row.get("created"),
+            "reading_id": row["id"],
+        }
+
+
+# --------------------- Graph Writes ---------------------
+# Readings identify their collar by device_data.csv's id_api, which the
+# device uploader stores as Device.id_api (Device.id is the devices.csv row id).
+ALERT_INDEXES = [
+    "CREATE CONSTRAINT alert_id IF NOT EXISTS FOR (al:Alert) REQUIRE al.id IS UNIQUE",
+    "CREATE INDEX alert_created IF NOT EXISTS FOR (al:Alert) ON (al.created)",
+    "CREATE INDEX alert_kind IF NOT EXISTS FOR (al:Alert) ON (al.kind)",
+    "CREATE INDEX device_id_api IF NOT EXISTS FOR (d:Device) ON (d.id_api)",
+    "CREATE CONSTRAINT series_day_id IF NOT EXISTS FOR (s:SeriesDay) REQUIRE s.id IS UNIQUE",
+]
+
+
+def ensure_alert_indexes(session):
+    for statement in ALERT_INDEXES:
+        session.run(statement)
+
+
+def load_detector_state(session, detector: AnomalyDetector):
+    """Resume rolling statistics persisted on Device nodes by a previous run."""
+    result = session.run("""
+        MATCH (d:Device)
+        WHERE d.temp_count IS NOT NULL
+        RETURN d.id_api AS id, properties(d) AS props
+    """)
+    for record in result:
+        detector.load_state(record["id"], record["props"])
+
+
+def write_device_reading(tx, row: dict, detector: AnomalyDetector, store_node: bool = True):
+    """
+    MERGE one DeviceData reading and any Alert nodes it triggers,
+    inside the caller's transaction. Returns the alerts.
+    With store_node=False the reading itself is left to the series store
+    and only the alerts reach the graph, triggered by the reading's SeriesDay.
+    """
+    if store_node:
+        tx.run(
+            """
+            MERGE (dd:DeviceData {id: $id})
+            SET dd.created = $created,
+                dd.acc_x = toFloat($acc_x),
+                dd.acc_y = toFloat($acc_y),
+                dd.acc_z = toFloat($acc_z),
+                dd.std_x = toFloat($std_x),
+                dd.std_y = toFloat($std_y),
+                dd.std_z = toFloat($std_z),
+                dd.max_x = toFloat($max_x),
+                dd.max_y = toFloat($max_y),
+                dd.max_z = toFloat($max_z),
+                dd.temperature = toFloat($temperature),
+                dd.coordinates = $coordinates
+            WITH dd
+            MATCH (d:Device {id_api: $id_api})
+            MERGE (dd)-[:FROM_DEVICE]->(d)
+            """,
+            id=row['id'],
+            created=row.get('created'),
+            acc_x=row.get('acc_x', '0'),
+            acc_y=row.get('acc_y', '0'),
+            acc_z=row.get('acc_z', '0'),
+            std_x=row.get('std_x', '0'),
+            std_y=row.get('std_y', '0'),
+            std_z=row.get('std_z', '0'),
+            max_x=row.get('max_x', '0'),
+            max_y=row.get('max_y', '0'),
+            max_z=row.get('max_z', '0'),
+            temperature=row.get('temperature', '0'),
+            coordinates=row.get('coordinates', ''),
+            id_api=row.get('id_api')
+        )
+
+    alerts = detector.check(row.get('id_api'), row)
+    series_day = None
+    if alerts and not store_node:
+        try:
+            day = datetime.fromtimestamp(parse_ts(row.get('created')), tz=timezone.utc).date().isoformat()
+            series_day = series_day_id(DEVICE_DATA, row.get('id_api'), day)
+        except ValueError:
+            pass
+    for alert in alerts:
+        tx.run(
+            """
+            MATCH (:Device {id_api: $id_api})-[:ATTACHED_TO]->(a:Animal)
+            MERGE (al:Alert {id: $id})
+            ON CREATE SET a.alert_count = coalesce(a.alert_count, 0) + 1,
+                          a.fever_alerts = coalesce(a.fever_alerts, 0) + CASE $kind WHEN 'fever' THEN 1 ELSE 0 END,
+                          a.low_movement_alerts = coalesce(a.low_movement_alerts, 0)
+                                                  + CASE $kind WHEN 'low_movement' THEN 1 ELSE 0 END
+            SET al.kind = $kind,
+                al.value = $value,
+                al.zscore = $zscore,
+                al.baseline = $baseline,
+                al.created = $created,
+                al.reading_id = $reading_id
+            MERGE (al)-[:ABOUT]->(a)
+            WITH al
+            OPTIONAL MATCH (dd:DeviceData {id: $reading_id})
+            OPTIONAL MATCH (sd:SeriesDay {id: $series_day})
+            FOREACH (_ IN CASE WHEN dd IS NULL THEN [] ELSE [1] END |
+                MERGE (al)-[:TRIGGERED_BY]->(dd))
+            FOREACH (_ IN CASE WHEN sd IS NULL THEN [] ELSE [1] END |
+                MERGE (al)-[:TRIGGERED_BY]->(sd))
+            """,
+            id_api=row.get('id_api'),
+            series_day=series_day,
+            **alert
+        )
+    return alerts
+
+
+def write_device_batch(tx, batch, detector: AnomalyDetector, store=None):
+    """
+    Write a batch of readings in the caller's transaction: raw readings go to
+    the series store when one is configured (SeriesDay rollups in the graph),
+    otherwise to DeviceData nodes. The animals' latest vitals and their farms'
+    summaries are updated in the same transaction. Returns the number of
+    alerts raised.
+    """
+    # Rollups first, so alerts can link to the SeriesDay holding their reading.
+    if store is not None:
+        by_device = {}
+        for row in batch:
+            by_device.setdefault(row.get('id_api'), []).append(row)
+        for device_id, rows in by_device.items():
+            write_rollups(tx, store, store.append(DEVICE_DATA, device_id, rows))
+
+    alert_count = 0
+    for row in batch:
+        alert_count += len(write_device_reading(tx, row, detector, store_node=store is None))
+
+    device_ids = {row.get('id_api') for row in batch}
+    save_detector_state(tx, detector, device_ids)
+    save_latest_vitals(tx, batch)
+    refresh_device_farms(tx, device_ids)
+    bump_graph_version(tx)
+    return alert_count
+
+
+def save_detector_state(tx, detector: AnomalyDetector, device_ids):
+    """Persist rolling statistics on Device nodes, in the same transaction as the batch."""
+    for device_id in device_ids:
+        tx.run(
+            """
+            MATCH (d:Device {id_api: $id})
+            SET d += $state
+            """,
+            id=device_id,
+            state=detector.state(device_id),
+        )
+
+
+def save_latest_vitals(tx, batch):
+    """Keep each animal's most recent temperature/activity from this batch of readings."""
+    latest = {}
+    for row in batch:
+        device_id = row.get("id_api")
+        row = dict(row, created=normalize_ts(row.get("created"))) if row.get("created") else row
+        if device_id and str(row.get("created") or "") >= str(latest.get(device_id, {}).get("created") or ""):
+            latest[device_id] = row
+    for device_id, row in latest.items():
+        tx.run(
+            """
+            MATCH (d:Device {id_api: $id})-[:ATTACHED_TO]->(a:Animal)
+            WHERE a.last_seen IS NULL OR a.last_seen <= $created
+            SET a.last_temperature = toFloat($temperature),
+                a.last_activity = $activity,
+                a.last_seen = $created,
+                d.last_seen = $created
+            """,
+            id=device_id,
+            created=row.get("created"),
+            temperature=row.get("temperature"),
+            activity=round(acc_magnitude(row), 1),
+        )
@@ -0,0 +1,14 @@
+"""
+Graph version stamp: a single GraphVersion node whose counter every writer
+bumps inside its own transaction. Readers use it to build ETags.
+"""
+
+BUMP_GRAPH_VERSION = """
+    MERGE (v:GraphVersion {id: 'graph'})
+    SET v.version = coalesce(v.version, 0) + 1,
+        v.updated = datetime()
+"""
+
+
+def bump_graph_version(tx):
+    tx.run(BUMP_GRAPH_VERSION)
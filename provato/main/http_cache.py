@@ -0,0 +1,92 @@
+"""
+Conditional GET for read-only graph views.
+
+ETags combine the graph version stamp, the application's build version
+and the view's own key (node id, query string), so an If-None-Match hit is answered with 304 before the view
+runs and without a Neo4j round trip. The version stamp itself is cached for
+GRAPH_VERSION_TTL seconds, which bounds how stale a 304 can be after an
+external upload; writes made by this process invalidate it immediately.
+A deploy changes the build version, so clients never get a 304 for a page
+rendered by the previous code.
+"""
+import hashlib
+import os
+
+from django.core.cache import cache
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .graph.neo4j_connector import get_graph_version
+
+GRAPH_VERSION_TTL = int(os.getenv("GRAPH_VERSION_TTL", "30"))
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "0"))
+HTTP_CACHE_S_MAXAGE = int(os.getenv("HTTP_CACHE_S_MAXAGE", "0"))
+
+_VERSION_KEY = "graph_version"
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _source_digest():
+    """Hash of the app's code, templates and static files: changes with every deploy."""
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(_APP_DIR):
+        dirs[:] = sorted(d for d in dirs if d not in ("__pycache__", "tests", "migrations"))
+        for name in sorted(files):
+            if name.endswith((".py", ".html", ".css", ".js")):
+                with open(os.path.join(root, name), "rb") as f:
+                    digest.update(name.encode("utf-8"))
+                    digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+# Set APP_VERSION (e.g. the git SHA) at deploy time to skip hashing the sources.
+APP_VERSION = os.getenv("APP_VERSION", "")
+_app_version = None
+
+
+def app_version():
+    """APP_VERSION, or the source digest computed on first use and kept for the process."""
+    global _app_version
+    if _app_version is None:
+        _app_version = APP_VERSION or _source_digest()
+    return _app_version
+
+
+def graph_version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        try:
+            version = get_graph_version()
+        except Exception as e:
+            print("Graph version lookup failed:", e)
+            return None
+        cache.set(_VERSION_KEY, version, GRAPH_VERSION_TTL)
+    return version
+
+
+def invalidate_graph_version():
+    cache.delete(_VERSION_KEY)
+
+
+def graph_etag(*parts):
+    version = graph_version()
+    if version is None:
+        return None
+    key = "\x1f".join(str(p) for p in (app_version(), version) + parts)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:24]
+
+
+def graph_cached(etag_parts):
+    """
+    Decorate a GET view whose output depends only on the graph and on
+    etag_parts(request, *args, **kwargs).
+    """
+    def decorator(view):
+        name = view.__name__
+
+        def etag_func(request, *args, **kwargs):
+            return graph_etag(name, *etag_parts(request, *args, **kwargs))
+
+        wrapped = condition(etag_func=etag_func)(view)
+        return cache_control(public=True, max_age=HTTP_CACHE_MAX_AGE, s_maxage=HTTP_CACHE_S_MAXAGE)(wrapped)
+    return decorator
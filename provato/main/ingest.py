@@ -0,0 +1,346 @@
+import collections
+import errno
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+
+from .graph.driver import NEO4J_DB, get_driver
+from .graph.telemetry import (
+    AnomalyDetector, ensure_alert_indexes, load_detector_state, write_device_batch,
+)
+from .graph.series_store import get_store, normalize_ts
+from .http_cache import invalidate_graph_version
+
+try:
+    import fcntl
+except ImportError:  # Windows: spill files are not locked, run a single worker
+    fcntl = None
+
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "20000"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_FLUSH_SECONDS = float(os.getenv("INGEST_FLUSH_SECONDS", "2.0"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "5"))
+INGEST_SPILL_DIR = os.getenv("INGEST_SPILL_DIR", os.path.join(_BASE_DIR, "ingest_spill"))
+INGEST_SPILL_SEGMENT_ROWS = int(os.getenv("INGEST_SPILL_SEGMENT_ROWS", "5000"))
+INGEST_QUARANTINE_PATH = os.getenv("INGEST_QUARANTINE_PATH", os.path.join(_BASE_DIR, "ingest_quarantine.jsonl"))
+
+READING_FIELDS = [
+    "id", "id_api", "created", "acc_x", "acc_y", "acc_z", "std_x", "std_y", "std_z",
+    "max_x", "max_y", "max_z", "temperature", "coordinates",
+]
+
+# Worth waiting out; anything else counts towards INGEST_MAX_ATTEMPTS.
+# Other OS errors (permissions, missing paths) will not go away by waiting.
+TRANSIENT_ERRORS = (ServiceUnavailable, SessionExpired, TransientError)
+TRANSIENT_ERRNOS = {errno.EAGAIN, errno.EINTR, errno.EBUSY, errno.ETIMEDOUT,
+                    errno.ECONNRESET, errno.ECONNREFUSED}
+
+
+def _is_transient(error) -> bool:
+    return isinstance(error, TRANSIENT_ERRORS) or \
+        (isinstance(error, OSError) and error.errno in TRANSIENT_ERRNOS)
+
+
+class BufferFull(Exception):
+    pass
+
+
+def _try_lock(f) -> bool:
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _is_spill_file(name: str) -> bool:
+    return name.startswith("spill-") and name.endswith(".jsonl")
+
+
+def _discard(path, f):
+    """Delete a spill file this process holds (removed before unlocking where the OS allows it)."""
+    if fcntl is None:
+        f.close()
+    os.remove(path)
+    f.close()
+
+
+class _Segment:
+    """One spill file, held open and locked by the process that writes it."""
+    __slots__ = ("path", "file", "rows", "outstanding")
+
+    def __init__(self, path, f):
+        self.path = path
+        self.file = f
+        self.rows = 0
+        self.outstanding = 0
+
+
+class ReadingBuffer:
+    """
+    Bounded in-process queue of collar readings with a write-behind flusher.
+
+    Every accepted reading is appended to a spill segment before it is
+    queued. Segments belong to one process (named by pid, locked while it
+    lives) and are deleted as soon as all of their rows are committed, so
+    the spill directory stays bounded under steady load and workers never
+    touch each other's files. Segments whose process has gone are claimed
+    and replayed straight from disk when a writer starts, without passing
+    through the queue; replaying already-committed readings is harmless
+    because DeviceData and Alert writes are MERGEs on their ids and the
+    series store drops readings it already holds.
+
+    A batch that keeps failing for a non-transient reason is retried row by
+    row after max_attempts, and rows that still fail are moved to the
+    quarantine file instead of blocking the queue.
+    """
+
+    def __init__(self, maxsize=INGEST_QUEUE_SIZE, batch_size=INGEST_BATCH_SIZE,
+                 flush_seconds=INGEST_FLUSH_SECONDS, spill_dir=INGEST_SPILL_DIR,
+                 segment_rows=INGEST_SPILL_SEGMENT_ROWS, max_attempts=INGEST_MAX_ATTEMPTS,
+                 quarantine_path=INGEST_QUARANTINE_PATH, retry_seconds=1.0):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.spill_dir = spill_dir
+        self.segment_rows = segment_rows
+        self.max_attempts = max_attempts
+        self.quarantine_path = quarantine_path
+        self.retry_seconds = retry_seconds
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._segments = collections.deque()
+        self._detector = AnomalyDetector()
+        self._thread = None
+
+    # ---- producer side ----
+    def put_many(self, rows):
+        with self._lock:
+            if self._pending + len(rows) > self.maxsize:
+                raise BufferFull()
+            self._spill(rows)
+            self._pending += len(rows)
+            # Queued under the lock so queue order matches segment order.
+            for row in rows:
+                self._queue.put(row)
+
+    def pending(self):
+        return self._pending
+
+    def _open_segment(self) -> _Segment:
+        os.makedirs(self.spill_dir, exist_ok=True)
+        name = f"spill-{os.getpid()}-{uuid.uuid4().hex[:12]}.jsonl"
+        # Locked under a temporary name first, so no other worker can take
+        # the new segment for an orphan before its lock is held.
+        tmp = os.path.join(self.spill_dir, f".{name}.tmp")
+        f = open(tmp, "a", encoding="utf-8")
+        _try_lock(f)
+        path = os.path.join(self.spill_dir, name)
+        os.replace(tmp, path)
+        segment = _Segment(path, f)
+        self._segments.append(segment)
+        return segment
+
+    def _spill(self, rows):
+        segment = self._segments[-1] if self._segments else None
+        if segment is None or segment.rows >= self.segment_rows:
+            segment = self._open_segment()
+        for row in rows:
+            segment.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        segment.file.flush()
+        os.fsync(segment.file.fileno())
+        segment.rows += len(rows)
+        segment.outstanding += len(rows)
+
+    def _committed(self, count):
+        """Release `count` rows from the front of the queue, deleting fully committed segments."""
+        with self._lock:
+            self._pending -= count
+            while count and self._segments:
+                segment = self._segments[0]
+                taken = min(count, segment.outstanding)
+                segment.outstanding -= taken
+                count -= taken
+                if segment.outstanding == 0:
+                    self._segments.popleft()
+                    _discard(segment.path, segment.file)
+
+    # ---- replay ----
+    def orphaned_segments(self):
+        """Spill files of processes that have exited, locked for this process."""
+        if not os.path.isdir(self.spill_dir):
+            return []
+        owned = {segment.path for segment in self._segments}
+        claimed = []
+        for name in sorted(os.listdir(self.spill_dir)):
+            path = os.path.join(self.spill_dir, name)
+            if not _is_spill_file(name) or path in owned:
+                continue
+            try:
+                f = open(path, encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            if _try_lock(f) and os.path.exists(path):
+                claimed.append((path, f))
+            else:
+                f.close()
+        return claimed
+
+    def replay_orphans(self):
+        for path, f in self.orphaned_segments():
+            replayed = 0
+            batch = []
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    batch.append(json.loads(line))
+                except ValueError:
+                    print("Skipping corrupt spill line:", line[:80])
+                    continue
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    replayed += len(batch)
+                    batch = []
+            if batch:
+                self._flush(batch)
+                replayed += len(batch)
+            _discard(path, f)
+            print(f"Replayed {replayed} spilled readings from {os.path.basename(path)}.")
+
+    # ---- writer side ----
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+        self._thread.start()
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        with get_driver().session(database=NEO4J_DB) as session:
+            try:
+                ensure_alert_indexes(session)
+                load_detector_state(session, self._detector)
+            except Exception as e:
+                print("Ingest writer setup failed:", e)
+
+        self.replay_orphans()
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+                self._committed(len(batch))
+
+    def _flush(self, batch):
+        """Write batch, retrying; returns once every row is committed or quarantined."""
+        attempts, backoff = 0, self.retry_seconds
+        while batch:
+            # After repeated failures, rows go one at a time so a bad row can
+            # be quarantined without holding up the rest.
+            chunk = batch[:1] if attempts >= self.max_attempts else batch
+            try:
+                self._write(chunk)
+            except Exception as e:
+                if _is_transient(e):
+                    print("Ingest flush failed, retrying:", e)
+                elif len(chunk) == 1 and attempts >= self.max_attempts:
+                    self._quarantine(chunk, e)
+                    batch = batch[1:]
+                    continue
+                else:
+                    attempts += 1
+                    print(f"Ingest flush failed (attempt {attempts}/{self.max_attempts}):", e)
+            else:
+                batch = batch[len(chunk):]
+                backoff = self.retry_seconds
+                continue
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+    def _quarantine(self, rows, error):
+        print(f"Quarantining {len(rows)} reading(s):", error)
+        lines = [json.dumps({"reading": row, "error": str(error)}, ensure_ascii=False) for row in rows]
+        try:
+            with open(self.quarantine_path, "a", encoding="utf-8") as f:
+                f.write("".join(line + "\n" for line in lines))
+        except Exception as e:
+            # The writer thread must outlive a bad quarantine path: log the rows instead.
+            print("Quarantine file not writable, logging the reading(s) instead:", e)
+            for line in lines:
+                print(line, file=sys.stderr)
+
+    def _write(self, batch):
+        # Score against a fork so a rolled-back batch does not advance the
+        # rolling statistics; a retry then sees exactly the same state.
+        detector = self._detector.fork({row.get("id_api") for row in batch})
+        with get_driver().session(database=NEO4J_DB) as session:
+            tx = session.begin_transaction()
+            write_device_batch(tx, batch, detector, get_store())
+            tx.commit()
+        self._detector.absorb(detector)
+        invalidate_graph_version()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer() -> ReadingBuffer:
+    """Shared process-wide buffer; the writer thread starts on first use."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ReadingBuffer()
+            _buffer.start()
+        return _buffer
+
+
+def has_spilled_readings(spill_dir=INGEST_SPILL_DIR) -> bool:
+    return os.path.isdir(spill_dir) and any(_is_spill_file(name) for name in os.listdir(spill_dir))
+
+
+def serving() -> bool:
+    """True in a web server process; False in manage.py commands other than runserver's serving child."""
+    if os.path.basename(sys.argv[0]) != "manage.py":
+        return True
+    return sys.argv[1:2] == ["runserver"] and (os.environ.get("RUN_MAIN") == "true" or "--noreload" in sys.argv)
+
+
+def normalize_reading(row: dict):
+    """
+    Keep the device_data.csv columns, stringified like the CSV uploader sees them,
+    with `created` in the CSV's UTC 'YYYY-MM-DD HH:MM:SS' form.
+    Returns None when the reading cannot be keyed.
+    """
+    reading = {k: (str(row[k]).strip() if row.get(k) is not None else None)
+               for k in READING_FIELDS if k in row}
+    if not reading.get("id") or not reading.get("id_api"):
+        return None
+    if reading.get("created"):
+        reading["created"] = normalize_ts(reading["created"])
+    return reading
@@ -1,8 +1,12 @@
 import os
 import json
+import re
+import threading
 from typing import Dict
 from openai import OpenAI
 
+from .metrics import span
+
 SYSTEM_PROMPT = (
     "You are an intelligent farm assistant. "
     "Chat naturally with the user, but when the question is factual or about sheep, farms, or related data, "
@@ -14,25 +18,54 @@ SYSTEM_PROMPT = (
 openai_api_key = os.getenv('OPENAI_API_KEY')
 openai_base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 openai_model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+openai_timeout = float(os.getenv("OPENAI_TIMEOUT", "60"))
+openai_max_retries = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OpenAI:
+    """Shared OpenAI client, created on first use rather than at import."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(api_key=openai_api_key, base_url=openai_base_url,
+                                 timeout=openai_timeout, max_retries=openai_max_retries)
+    return _client
 
-client = OpenAI(api_key=openai_api_key, base_url=openai_base_url)
 
+def warm_up():
+    """Open a keep-alive connection to the API so the first chat skips the TLS handshake."""
+    get_client().models.list()
 
-def _openai_generate(prompt: str) -> str:
+
+NO_ANSWER = "I do not have enough information."
+
+
+def _openai_generate(prompt: str, purpose: str = "answer", fallback: str = NO_ANSWER):
+    """The model's reply, or `fallback` when the call fails."""
     try:
-        response = client.chat.completions.create(
-            model=openai_model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-        )
+        with span(f"llm_{purpose}") as s:
+            response = get_client().chat.completions.create(
+                model=openai_model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.2,
+            )
+            if response.usage:
+                s.add("llm_prompt_tokens", response.usage.prompt_tokens or 0)
+                s.add("llm_completion_tokens", response.usage.completion_tokens or 0)
         return response.choices[0].message.content.strip()
     except Exception as e:
         print("OpenAI generate failed:", e)
-        return "I do not have enough information."
+        return fallback
 
 
-def call_llm(question: str, context_text: str, history=None) -> Dict[str, str]:
+def call_llm(question: str, context_text: str, history=None, summary: str = "") -> Dict[str, str]:
     history_block = "\n".join(f"{m['role']}: {m['content']}" for m in (history or [])[-8:])
+    if summary:
+        history_block = f"(Earlier, summarized) {summary}\n{history_block}"
     prompt = (
         f"System: {SYSTEM_PROMPT}\n\n"
         f"You must answer **only** using the provided Neo4j context. "
@@ -49,14 +82,57 @@ def call_llm(question: str, context_text: str, history=None) -> Dict[str, str]:
     return {"answer": answer, "source": "openai"}
 
 
-def extract_search_plan(question: str) -> dict:
+# Planner output is run as-is, so only read queries are accepted.
+READ_QUERY = re.compile(r"^(OPTIONAL\s+MATCH|MATCH|CALL|WITH|UNWIND|RETURN)\b", re.IGNORECASE)
+WRITE_CLAUSE = re.compile(r"\b(CREATE|MERGE|DELETE|DETACH|SET|REMOVE|DROP|LOAD\s+CSV|FOREACH)\b", re.IGNORECASE)
+CODE_FENCE = re.compile(r"^```\w*\s*|\s*```$")
+FARM_SUMMARY_ROUTE = "FARM_SUMMARY"
+
+
+def read_only_cypher(text: str):
+    """The planner's reply as a read-only Cypher query, or None when it is not one."""
+    cypher = CODE_FENCE.sub("", (text or "").strip()).strip()
+    if not READ_QUERY.match(cypher) or WRITE_CLAUSE.search(cypher):
+        return None
+    return cypher
+
+
+def extract_search_plan(question: str, conversation_context: str = "") -> dict:
+    """
+    {"cypher": query} from the planner, or {"cypher": None} when it replied
+    with anything but a read query (including the failure fallback text).
+    Farm-wide aggregate questions come back as {"route": "farm_summary"}.
+    """
+    conversation_block = (
+        "Conversation so far (resolve follow-ups such as 'her' or 'that farm' against it, "
+        "reusing the elementIds and queries listed there):\n"
+        f"{conversation_context}\n\n"
+    ) if conversation_context else ""
     prompt = (
         "Translate this natural language question into a Cypher query for a Neo4j graph "
         "with nodes: Animal, Farm, Device, MeteoData. "
         "Use English property names (id, name, breed, sex, type, coordinates, etc.). "
         "If it is a general animal question, return a MATCH for all Animal nodes. "
+        "If it asks for farm-wide counts, averages or breakdowns (not about one animal or device), "
+        f"output only {FARM_SUMMARY_ROUTE} instead. "
         "Output only the Cypher query text, nothing else.\n\n"
+        f"{conversation_block}"
         f"Question: {question}"
     )
-    cypher = _openai_generate(prompt)
-    return {"cypher": cypher.strip()}
+    reply = _openai_generate(prompt, purpose="plan")
+    if CODE_FENCE.sub("", reply.strip()).strip().upper() == FARM_SUMMARY_ROUTE:
+        return {"route": "farm_summary", "cypher": None}
+    return {"cypher": read_only_cypher(reply)}
+
+
+def summarize_conversation(summary: str, turns) -> str:
+    """Fold evicted turns into the rolling conversation summary; None when the call fails."""
+    turns_block = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+    prompt = (
+        "Update this running summary of a conversation about farm data. "
+        "Keep the animals, farms, devices and facts that were asked about or answered, "
+        "in at most five short sentences. Output only the summary.\n\n"
+        f"Current summary:\n{summary or '(none)'}\n\n"
+        f"New turns:\n{turns_block}"
+    )
+    return _openai_generate(prompt, purpose="summary", fallback=None)
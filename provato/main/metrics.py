@@ -0,0 +1,180 @@
+"""
+Per-request timing spans, exported as Server-Timing headers and aggregated
+into Prometheus text-format metrics served by metrics_view.
+"""
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.http import HttpResponse
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+SIZE_BUCKETS = [100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000]
+
+slow_query_log = logging.getLogger("provato.slow_query")
+
+_spans = contextvars.ContextVar("provato_spans", default=None)
+
+
+# --------------------- Registry ---------------------
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(buckets)
+            hist.observe(value)
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name in sorted({n for n, _ in self._counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (n, labels), value in sorted(self._counters.items()):
+                    if n == name:
+                        lines.append(f"{name}{_labels(labels)} {value}")
+            for name in sorted({n for n, _ in self._histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (n, labels), hist in sorted(self._histograms.items(), key=lambda kv: kv[0]):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets + ["+Inf"], hist.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {hist.sum}")
+                    lines.append(f"{name}_count{_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{str(v)}"'.replace("\n", " ") for k, v in labels)
+    return "{" + inner + "}"
+
+
+registry = _Registry()
+
+
+# --------------------- Spans ---------------------
+class Span:
+    def __init__(self, name):
+        self.name = name
+        self.duration = 0.0
+        self.attrs = {}
+
+    def add(self, key, value):
+        """Accumulate a numeric attribute (tokens, rows, ...); exported as a counter."""
+        self.attrs[key] = self.attrs.get(key, 0) + value
+
+
+@contextmanager
+def span(name: str, cypher: str = None):
+    """
+    Time a block. The span is recorded on the current request (Server-Timing)
+    and in the provato_span_seconds histogram. Pass the query text as
+    `cypher` to have it written to the slow-query log when SLOW_QUERY_MS is set.
+    """
+    current = Span(name)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - start
+        registry.observe("provato_span_seconds", {"span": name}, current.duration)
+        for key, value in current.attrs.items():
+            registry.inc(f"provato_{key}_total", {"span": name}, value)
+        spans = _spans.get()
+        if spans is not None:
+            spans.append(current)
+        if cypher and SLOW_QUERY_MS and current.duration * 1000 >= SLOW_QUERY_MS:
+            slow_query_log.warning("%s took %.1f ms (%s rows): %s", name, current.duration * 1000,
+                                   current.attrs.get("neo4j_rows", "?"), " ".join(cypher.split()))
+
+
+def observe_size(name: str, value: int):
+    """Record a size (e.g. LLM context characters) on the current request and as a histogram."""
+    registry.observe(f"provato_{name}", {}, value, SIZE_BUCKETS)
+    spans = _spans.get()
+    if spans is not None:
+        sized = Span(name)
+        sized.attrs[name] = value
+        spans.append(sized)
+
+
+# --------------------- Django glue ---------------------
+class ServerTimingMiddleware:
+    """Collects the spans of each request and reports them in a Server-Timing header."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        spans = []
+        token = _spans.set(spans)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _spans.reset(token)
+        total = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        view = match.url_name if match and match.url_name else "unknown"
+        registry.observe("provato_request_seconds", {"view": view}, total)
+        response["Server-Timing"] = _server_timing(spans, total)
+        return response
+
+
+def _server_timing(spans, total) -> str:
+    merged = {}
+    for s in spans:
+        entry = merged.setdefault(s.name, {"dur": 0.0, "attrs": {}})
+        entry["dur"] += s.duration
+        for key, value in s.attrs.items():
+            entry["attrs"][key] = entry["attrs"].get(key, 0) + value
+
+    parts = []
+    for name, entry in merged.items():
+        part = f"{name};dur={entry['dur'] * 1000:.1f}"
+        if entry["attrs"]:
+            desc = " ".join(f"{k}={v}" for k, v in entry["attrs"].items())
+            part += f';desc="{desc}"'
+        parts.append(part)
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
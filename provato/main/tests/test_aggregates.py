@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from main import llm
+from main.aggregates import is_aggregate_question
+from main.graph.farm_summary import with_activity
+from main.llm import extract_search_plan
+
+
+class IsAggregateQuestionTests(SimpleTestCase):
+    def test_farm_level_questions(self):
+        for question in [
+            "How many females per breed on each farm?",
+            "Average flock temperature",
+            "How many active devices per farm?",
+            "Number of goats by breed",
+            "Πόσα πρόβατα έχει κάθε φάρμα;",
+            "Μέση θερμοκρασία του κοπαδιού",
+        ]:
+            with self.subTest(question):
+                self.assertTrue(is_aggregate_question(question))
+
+    def test_questions_about_one_thing(self):
+        for question in [
+            "What does a low_movement alert mean?",
+            "What is the average temperature of Λάγια?",
+            "How many alerts does animal 023 have?",
+            "Average temperature of S00003 this week",
+            "How many readings did collar DT557 send?",
+            "Give me a summary of Zackel",
+            "Total alerts for sheep #12",
+        ]:
+            with self.subTest(question):
+                self.assertFalse(is_aggregate_question(question))
+
+
+class PlannerRouteTests(SimpleTestCase):
+    def plan(self, reply):
+        with mock.patch.object(llm, "_openai_generate", lambda prompt, purpose: reply):
+            return extract_search_plan("Which farm is busiest?")
+
+    def test_planner_can_route_to_the_summaries(self):
+        self.assertEqual(self.plan("FARM_SUMMARY"), {"route": "farm_summary", "cypher": None})
+        self.assertEqual(self.plan("```\nFARM_SUMMARY\n```"), {"route": "farm_summary", "cypher": None})
+
+    def test_cypher_replies_keep_the_default_route(self):
+        self.assertEqual(self.plan("MATCH (f:Farm) RETURN f"), {"cypher": "MATCH (f:Farm) RETURN f"})
+
+
+class WithActivityTests(SimpleTestCase):
+    NOW = datetime(2025, 9, 16, 12, 0, tzinfo=timezone.utc)
+
+    def summary(self, *last_seen):
+        return {"vitals": [{"device_id": f"CS{n}", "temperature": 30.0 + n, "last_seen": seen}
+                           for n, seen in enumerate(last_seen)]}
+
+    def test_mixed_timestamp_forms_are_compared_in_utc(self):
+        summary = with_activity(self.summary(
+            "2025-09-16 11:00:00",        # CSV form, UTC
+            "2025-09-16T11:30:00Z",       # /ingest/ ISO form
+            "2025-09-16T13:30:00+03:00",  # 10:30 UTC
+            "2025-09-16T09:00:00+03:00",  # 06:00 UTC: too old
+            "not a date",
+            None,
+        ), active_hours=2, now=self.NOW)
+        self.assertEqual(summary["active_since"], "2025-09-16 10:00:00")
+        self.assertEqual(summary["active_devices"], 3)
+        self.assertEqual(summary["active_avg_temperature"], 31.0)
+
+    def test_naive_now_is_taken_as_utc(self):
+        summary = with_activity(self.summary("2025-09-16 11:00:00"), active_hours=2, now=self.NOW.replace(tzinfo=None))
+        self.assertEqual(summary["active_devices"], 1)
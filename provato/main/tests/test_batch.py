@@ -0,0 +1,89 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from main import batch
+from main.batch import answer_batch, normalize_question
+from main.graph import neo4j_connector
+
+
+class AnswerBatchTests(SimpleTestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.plans, self.retrievals, self.expansions, self.answers = [], [], [], []
+        self.empty_cypher = set()
+        for module, name, fake in [
+            (batch, "extract_search_plan", self.plan), (batch, "call_llm", self.answer),
+            (batch, "is_aggregate_question", lambda q: False),
+            (neo4j_connector, "run_generated_cypher", self.retrieve),
+            (neo4j_connector, "expand_question", self.expand),
+        ]:
+            patcher = mock.patch.object(module, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def plan(self, question):
+        with self.lock:
+            self.plans.append(question)
+        # Both breed questions resolve to the same query.
+        label = "Animal" if "breed" in question.lower() else "Farm"
+        return {"cypher": f"MATCH (n:{label}) RETURN n"}
+
+    def retrieve(self, cypher):
+        with self.lock:
+            self.retrievals.append(cypher)
+        facts = [] if cypher in self.empty_cypher else [cypher]
+        return {"facts": facts, "text_context": "\n".join(facts)}
+
+    def expand(self, question):
+        with self.lock:
+            self.expansions.append(question)
+        return {"facts": [f"expanded:{question}"], "text_context": f"expanded:{question}"}
+
+    def answer(self, question, context, history):
+        with self.lock:
+            self.answers.append(question)
+        return {"answer": f"{question} <- {context}", "source": "stub"}
+
+    def test_normalize_question(self):
+        self.assertEqual(normalize_question("  How  many Farms?? "), "how many farms")
+
+    def test_duplicates_are_answered_once(self):
+        questions = ["Which breeds?", "which  breeds", "List farms", "Which breeds?"]
+        results = answer_batch(questions, concurrency=4)
+
+        self.assertEqual([r["question"] for r in results], questions)
+        self.assertEqual(sorted(self.plans), ["List farms", "Which breeds?"])
+        self.assertEqual(sorted(self.answers), ["List farms", "Which breeds?"])
+        self.assertNotIn("duplicate_of", results[0])
+        self.assertEqual(results[1]["duplicate_of"], "Which breeds?")
+        self.assertEqual(results[3]["answer"], results[0]["answer"])
+
+    def test_same_cypher_is_retrieved_once(self):
+        results = answer_batch(["Which breeds?", "Count breeds", "List farms"], concurrency=3)
+
+        self.assertEqual(sorted(self.retrievals), ["MATCH (n:Animal) RETURN n", "MATCH (n:Farm) RETURN n"])
+        self.assertEqual(sorted(r["retrieval_shared"] for r in results[:2]), [False, True])
+        self.assertFalse(results[2]["retrieval_shared"])
+
+    def test_shared_cypher_without_rows_expands_each_question(self):
+        self.empty_cypher.add("MATCH (n:Animal) RETURN n")
+        results = answer_batch(["Zackel breed ewes", "Lacaune breed rams"], concurrency=2)
+
+        self.assertEqual(self.retrievals, ["MATCH (n:Animal) RETURN n"])
+        self.assertEqual(sorted(self.expansions), ["Lacaune breed rams", "Zackel breed ewes"])
+        self.assertEqual([r["answer"] for r in results],
+                         ["Zackel breed ewes <- expanded:Zackel breed ewes",
+                          "Lacaune breed rams <- expanded:Lacaune breed rams"])
+
+    def test_a_failing_question_does_not_sink_the_batch(self):
+        def plan(question):
+            if question == "boom":
+                raise RuntimeError("planner down")
+            return self.plan(question)
+
+        with mock.patch.object(batch, "extract_search_plan", plan):
+            results = answer_batch(["boom", "List farms"])
+        self.assertEqual(results[0], {"question": "boom", "error": "planner down"})
+        self.assertIn("answer", results[1])
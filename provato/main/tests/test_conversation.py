@@ -0,0 +1,131 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from neo4j import Record
+from neo4j.graph import Graph, Node
+
+from main import conversation, llm
+from main.conversation import Conversation
+from main.graph import neo4j_connector
+from main.graph.driver import set_driver
+from main.graph.neo4j_connector import retrieve_context, run_generated_cypher
+
+
+class FitBudgetTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = []
+
+    def summarize(self, summary, turns):
+        self.calls.append(len(turns) // 2)
+        return (summary + " " + " ".join(t["content"] for t in turns)).strip()
+
+    def chat(self, conv, count, answer="ok"):
+        for n in range(count):
+            conv.add_turn(f"question {n}", answer)
+            conv.fit_budget(self.summarize)
+
+    @mock.patch.object(conversation, "CHAT_RECENT_TURNS", 6)
+    def test_evicts_in_chunks_past_the_turn_limit(self):
+        conv = Conversation("c")
+        self.chat(conv, 20)
+        # Once every four turns past the limit, not on every turn.
+        self.assertEqual(self.calls, [4, 4, 4, 4])
+        self.assertLessEqual(len(conv.turns), 6 * 2)
+        self.assertIn("question 0", conv.summary)
+
+    @mock.patch.object(conversation, "CHAT_RECENT_TURNS", 6)
+    def test_nothing_happens_within_budget(self):
+        conv = Conversation("c")
+        self.chat(conv, 6)
+        self.assertEqual(self.calls, [])
+        self.assertEqual(conv.summary, "")
+
+    @mock.patch.object(conversation, "CHAT_RECENT_TURNS", 6)
+    @mock.patch.object(conversation, "CHAT_TOKEN_BUDGET", 200)
+    def test_token_budget_evicts_further(self):
+        conv = Conversation("c")
+        self.chat(conv, 3, answer="x" * 400)
+        self.assertEqual([t["content"] for t in conv.turns], ["question 2", "x" * 400])
+        self.assertEqual(len(self.calls), 2)
+
+    @mock.patch.object(conversation, "CHAT_RECENT_TURNS", 6)
+    def test_failed_summary_keeps_summary_and_turns(self):
+        conv = Conversation("c", {"summary": "Asked about Zackel."})
+        for n in range(7):
+            conv.add_turn(f"question {n}", "ok")
+        conv.fit_budget(lambda summary, turns: None)
+        self.assertEqual(conv.summary, "Asked about Zackel.")
+        self.assertEqual(len(conv.turns), 7 * 2)
+
+        # Still failing: bounded at twice the recent-turn limit.
+        for n in range(20):
+            conv.add_turn(f"more {n}", "ok")
+            conv.fit_budget(lambda summary, turns: None)
+        self.assertEqual(len(conv.turns), 6 * 4)
+        self.assertEqual(conv.turns[-1]["content"], "ok")
+
+    def test_summarize_conversation_reports_failure(self):
+        def broken_client():
+            raise RuntimeError("API down")
+
+        with mock.patch.object(llm, "get_client", broken_client):
+            self.assertIsNone(llm.summarize_conversation("Asked about Zackel.", [{"role": "user", "content": "hi"}]))
+
+
+class _Result(list):
+    def peek(self):
+        return self[0] if self else None
+
+
+class _Session:
+    def __init__(self, records):
+        self.records = records
+
+    def run(self, query, parameters=None, **kwargs):
+        return _Result(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Driver:
+    def __init__(self, records):
+        self.records = records
+
+    def session(self, **kwargs):
+        return _Session(self.records)
+
+
+class GeneratedCypherNodesTests(SimpleTestCase):
+    def test_returned_nodes_are_remembered(self):
+        graph = Graph()
+        ewe = Node(graph, "4:x:1", 1, ["Animal"], {"name": "Ντόλυ", "id_api": "S00001"})
+        farm = Node(graph, "4:x:2", 2, ["Farm"], {"name": "Farm1"})
+        set_driver(_Driver([Record({"a": ewe, "farms": [farm]}), Record({"a": ewe, "farms": []})]))
+        self.addCleanup(set_driver, None)
+
+        retrieval = run_generated_cypher("MATCH (a:Animal)-[:BELONGS_TO]->(f:Farm) RETURN a, collect(f) AS farms")
+        self.assertEqual([n["neo4j_id"] for n in retrieval["nodes"]], ["4:x:1", "4:x:2"])
+
+        conv = Conversation("c")
+        conv.remember_entities(retrieval["nodes"])
+        self.assertEqual(conv.entities, {"4:x:1": "Ντόλυ (Animal)", "4:x:2": "Farm1 (Farm)"})
+
+
+class ConversationRetrievalTests(SimpleTestCase):
+    def test_expansions_are_kept_per_question(self):
+        conv = Conversation("c")
+        cypher = "MATCH (a:Animal {breed: 'x'}) RETURN a"
+        expand = lambda question: {"facts": [question], "text_context": question}  # noqa: E731
+        with mock.patch.object(neo4j_connector, "run_generated_cypher", lambda c: {"facts": [], "text_context": ""}), \
+                mock.patch.object(neo4j_connector, "expand_question", expand):
+            first, _ = retrieve_context(cypher, "Zackel ewes", conv.retrieval)
+            second, reused = retrieve_context(cypher, "Lacaune rams", conv.retrieval)
+            again, reused_again = retrieve_context(cypher, "Zackel ewes", conv.retrieval)
+        self.assertEqual(second["facts"], ["Lacaune rams"])
+        self.assertFalse(reused)
+        self.assertEqual(again["facts"], first["facts"])
+        self.assertTrue(reused_again)
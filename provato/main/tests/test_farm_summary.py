@@ -0,0 +1,21 @@
+from django.test import SimpleTestCase
+
+from main.graph.farm_summary import rebuild_farm_summaries
+from main.graph.version import BUMP_GRAPH_VERSION
+from main.tests.utils import RecordingTransaction
+
+
+class _Session(RecordingTransaction):
+    def execute_write(self, work, *args):
+        return work(self, *args)
+
+
+class RebuildFarmSummariesTests(SimpleTestCase):
+    def test_rebuild_bumps_the_graph_version(self):
+        session = _Session({"RETURN f.id AS farm_id": [{"farm_id": "1", "farm": {"name": "Farm1"}, "animals": []}]})
+        rebuild_farm_summaries(session)
+
+        queries = [query for query, _ in session.statements]
+        saved = next(i for i, q in enumerate(queries) if "MERGE (fs:FarmSummary" in q)
+        self.assertEqual(queries[-1], BUMP_GRAPH_VERSION)
+        self.assertLess(saved, len(queries) - 1)
@@ -0,0 +1,31 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from main import http_cache
+from main.http_cache import graph_etag
+
+
+@mock.patch.object(http_cache, "graph_version", lambda: 7)
+class GraphEtagTests(SimpleTestCase):
+    def test_stable_for_one_build_and_graph_version(self):
+        self.assertEqual(graph_etag("detail_view", "4:x:1"), graph_etag("detail_view", "4:x:1"))
+        self.assertNotEqual(graph_etag("detail_view", "4:x:1"), graph_etag("detail_view", "4:x:2"))
+
+    def test_a_deploy_changes_every_etag(self):
+        before = graph_etag("home")
+        with mock.patch.object(http_cache, "_app_version", "next-release"):
+            self.assertNotEqual(graph_etag("home"), before)
+
+    def test_no_etag_without_a_graph_version(self):
+        with mock.patch.object(http_cache, "graph_version", lambda: None):
+            self.assertIsNone(graph_etag("home"))
+
+    def test_source_digest_is_computed_once_on_first_use(self):
+        with mock.patch.object(http_cache, "_app_version", None), \
+                mock.patch.object(http_cache, "APP_VERSION", ""), \
+                mock.patch.object(http_cache, "_source_digest", mock.Mock(return_value="abc123")) as digest:
+            graph_etag("home")
+            graph_etag("home")
+            self.assertEqual(digest.call_count, 1)
+            self.assertEqual(http_cache.app_version(), "abc123")
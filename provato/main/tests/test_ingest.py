@@ -0,0 +1,168 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+from neo4j.exceptions import ServiceUnavailable
+
+from main import ingest, views
+from main.graph.driver import set_driver
+from main.ingest import ReadingBuffer, normalize_reading
+from main.tests.utils import FlakyDriver, reading, steady_readings
+
+
+class RecordingBuffer(ReadingBuffer):
+    """Writes nothing; records batches and fails for rows whose id is 'bad'."""
+
+    def __init__(self, **kwargs):
+        super().__init__(retry_seconds=0, **kwargs)
+        self.written = []
+
+    def _write(self, batch):
+        if any(row["id"] == "bad" for row in batch):
+            raise ValueError("cannot convert float NaN to integer")
+        self.written.extend(row["id"] for row in batch)
+
+
+class ReadingBufferTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.spill_dir = os.path.join(self.tmp.name, "spill")
+        self.quarantine = os.path.join(self.tmp.name, "quarantine.jsonl")
+
+    def tearDown(self):
+        ingest._buffer = None
+        set_driver(None)
+        self.tmp.cleanup()
+
+    def spill_files(self):
+        return sorted(n for n in os.listdir(self.spill_dir) if n.startswith("spill-"))
+
+    @mock.patch.object(views, "INGEST_TOKEN", "s3cret")
+    def test_full_buffer_answers_429(self):
+        ingest._buffer = ReadingBuffer(maxsize=2, spill_dir=self.spill_dir)  # never started
+        auth = {"Authorization": "Bearer s3cret"}
+        response = self.client.post("/ingest/", data=json.dumps([reading(n) for n in range(3)]),
+                                    content_type="application/json", headers=auth)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        self.assertFalse(os.path.isdir(self.spill_dir) and self.spill_files())
+
+        response = self.client.post("/ingest/", data=json.dumps([reading(0), {"id": "no device"}]),
+                                    content_type="application/json", headers=auth)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {"accepted": 1, "rejected": 1})
+
+    def test_segments_are_deleted_once_committed(self):
+        buffer = ReadingBuffer(spill_dir=self.spill_dir, segment_rows=2)
+        buffer.put_many([reading(0), reading(1)])
+        buffer.put_many([reading(2), reading(3)])
+        buffer.put_many([reading(4)])
+        self.assertEqual(len(self.spill_files()), 3)
+        self.assertEqual(buffer.pending(), 5)
+
+        buffer._committed(3)
+        self.assertEqual(len(self.spill_files()), 2)
+        buffer._committed(2)
+        self.assertEqual(self.spill_files(), [])
+        self.assertEqual(buffer.pending(), 0)
+
+        buffer.put_many([reading(5)])
+        self.assertEqual(len(self.spill_files()), 1)
+
+    def test_orphans_are_replayed_and_live_segments_are_left_alone(self):
+        live = ReadingBuffer(spill_dir=self.spill_dir)
+        live.put_many([reading(0)])
+        orphan = os.path.join(self.spill_dir, "spill-999-dead.jsonl")
+        with open(orphan, "w", encoding="utf-8") as f:
+            for n in (10, 11, 12):
+                f.write(json.dumps(reading(n)) + "\n")
+            f.write("{not json\n")
+
+        self.assertTrue(ingest.has_spilled_readings(self.spill_dir))
+        replayer = RecordingBuffer(spill_dir=self.spill_dir, batch_size=2)
+        replayer.replay_orphans()
+
+        self.assertEqual(replayer.written, ["10", "11", "12"])
+        self.assertFalse(os.path.exists(orphan))
+        self.assertEqual(self.spill_files(), [os.path.basename(live._segments[0].path)])
+        self.assertEqual(replayer.pending(), 0)
+
+    def test_bad_row_is_quarantined_after_max_attempts(self):
+        buffer = RecordingBuffer(spill_dir=self.spill_dir, max_attempts=2, quarantine_path=self.quarantine)
+        buffer._flush([reading(1), dict(reading(2), id="bad"), reading(3)])
+
+        self.assertEqual(buffer.written, ["1", "3"])
+        with open(self.quarantine, encoding="utf-8") as f:
+            quarantined = [json.loads(line) for line in f]
+        self.assertEqual([q["reading"]["id"] for q in quarantined], ["bad"])
+        self.assertIn("NaN", quarantined[0]["error"])
+
+    def test_permission_errors_are_not_retried_forever(self):
+        class StoreDenied(RecordingBuffer):
+            def _write(self, batch):
+                raise PermissionError(13, "Permission denied", "/srv/series/device_data")
+
+        buffer = StoreDenied(spill_dir=self.spill_dir, max_attempts=2, quarantine_path=self.quarantine)
+        buffer._flush([reading(1), reading(2)])
+        with open(self.quarantine, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+    def test_unwritable_quarantine_does_not_stop_the_writer(self):
+        missing = os.path.join(self.tmp.name, "no such dir", "quarantine.jsonl")
+        buffer = RecordingBuffer(spill_dir=self.spill_dir, max_attempts=1, quarantine_path=missing)
+        buffer._flush([dict(reading(1), id="bad"), reading(2)])
+        self.assertEqual(buffer.written, ["2"])
+
+    def test_rolled_back_batch_does_not_advance_the_detector(self):
+        driver = FlakyDriver(fail_commits=1, error=ServiceUnavailable("connection lost"))
+        set_driver(driver)
+        buffer = ReadingBuffer(spill_dir=self.spill_dir, retry_seconds=0)
+        buffer._flush(steady_readings(48) + [reading(48, temperature=31.5)])
+
+        self.assertEqual(len(driver.committed), 1)
+        self.assertEqual(len(driver.committed[0].matching("MERGE (al:Alert")), 1)
+        self.assertEqual(buffer._detector.state("CS342")["temp_count"], 49)
+
+
+class NormalizeReadingTests(SimpleTestCase):
+    def test_created_is_stored_as_utc_csv_time(self):
+        row = normalize_reading(dict(reading(1), created="2025-09-15T04:29:17+03:00", temperature=30.5))
+        self.assertEqual(row["created"], "2025-09-15 01:29:17")
+        self.assertEqual(row["temperature"], "30.5")
+        self.assertEqual(normalize_reading(reading(1))["created"], "2025-09-15 01:00:00")
+
+    def test_unkeyed_reading_is_rejected(self):
+        self.assertIsNone(normalize_reading({"id": "1", "created": "2025-09-15 01:00:00"}))
+
+
+class IngestViewAuthTests(SimpleTestCase):
+    def setUp(self):
+        self.accepted = []
+        buffer = mock.Mock(put_many=self.accepted.extend)
+        patcher = mock.patch.object(views, "get_buffer", lambda: buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, **headers):
+        return self.client.post("/ingest/", data=json.dumps([reading(1)]),
+                                content_type="application/json", headers=headers)
+
+    @mock.patch.object(views, "INGEST_TOKEN", "")
+    def test_refused_without_a_token_in_production(self):
+        with self.settings(DEBUG=False):
+            self.assertEqual(self.post().status_code, 403)
+        self.assertEqual(self.accepted, [])
+
+    @mock.patch.object(views, "INGEST_TOKEN", "")
+    def test_open_without_a_token_in_debug(self):
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.post().status_code, 202)
+
+    @mock.patch.object(views, "INGEST_TOKEN", "s3cret")
+    def test_token_is_checked(self):
+        self.assertEqual(self.post().status_code, 401)
+        self.assertEqual(self.post(Authorization="Bearer wrong").status_code, 401)
+        self.assertEqual(self.post(Authorization="Bearer s3cret").status_code, 202)
+        self.assertEqual(len(self.accepted), 1)
@@ -0,0 +1,94 @@
+import re
+from unittest import mock
+
+from django.test import SimpleTestCase
+from neo4j.exceptions import CypherSyntaxError
+
+from main import llm
+from main.graph import neo4j_connector
+from main.graph.neo4j_connector import RANKED_EXPANSION, expand_question, retrieve_context
+from main.llm import extract_search_plan, read_only_cypher
+
+EXPANDED = {"nodes": [], "facts": ["expanded"], "text_context": "expanded"}
+
+
+class ReadOnlyCypherTests(SimpleTestCase):
+    def test_accepts_read_queries(self):
+        self.assertEqual(read_only_cypher("MATCH (a:Animal) RETURN a LIMIT 5"), "MATCH (a:Animal) RETURN a LIMIT 5")
+        self.assertEqual(read_only_cypher("```cypher\nMATCH (f:Farm) RETURN f\n```"), "MATCH (f:Farm) RETURN f")
+        self.assertIsNotNone(read_only_cypher("optional match (a:Animal) return count(a)"))
+
+    def test_rejects_prose_and_writes(self):
+        self.assertIsNone(read_only_cypher("I do not have enough information."))
+        self.assertIsNone(read_only_cypher(""))
+        self.assertIsNone(read_only_cypher("MATCH (a:Animal) DETACH DELETE a"))
+        self.assertIsNone(read_only_cypher("MATCH (a:Animal) SET a.name = 'x' RETURN a"))
+
+    def test_planner_fallback_text_is_no_plan(self):
+        with mock.patch.object(llm, "_openai_generate", lambda prompt, purpose: "I do not have enough information."):
+            self.assertEqual(extract_search_plan("Zackel"), {"cypher": None})
+
+
+class RetrieveContextTests(SimpleTestCase):
+    def setUp(self):
+        self.cypher_calls = []
+        patcher = mock.patch.object(neo4j_connector, "expand_question", lambda question: EXPANDED)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_with(self, result, cypher="MATCH (a:Animal) RETURN a"):
+        def run(query):
+            self.cypher_calls.append(query)
+            return result
+        with mock.patch.object(neo4j_connector, "run_generated_cypher", run):
+            retrieval, reused = retrieve_context(cypher, "Zackel")
+            self.assertFalse(reused)
+            return retrieval
+
+    def test_uses_cypher_results(self):
+        found = {"facts": ["a: 1"], "text_context": "a: 1"}
+        self.assertIs(self.run_with(found), found)
+
+    def test_expands_without_cypher(self):
+        self.assertIs(self.run_with(None, cypher=None), EXPANDED)
+        self.assertEqual(self.cypher_calls, [])
+
+    def test_expands_on_error_or_empty_result(self):
+        self.assertIs(self.run_with({"error": "SyntaxError", "facts": [], "text_context": ""}), EXPANDED)
+        self.assertIs(self.run_with({"facts": [], "text_context": ""}), EXPANDED)
+
+
+def _columns(return_clause):
+    """Names a RETURN clause binds: the alias, or the bare variable."""
+    items, depth, current = [], 0, ""
+    for ch in return_clause:
+        depth += ch in "([{"
+        depth -= ch in ")]}"
+        if ch == "," and depth == 0:
+            items.append(current)
+            current = ""
+        else:
+            current += ch
+    items.append(current)
+    return [re.split(r"\bAS\b", item)[-1].strip() for item in items]
+
+
+class RankedExpansionQueryTests(SimpleTestCase):
+    def test_subqueries_do_not_return_imported_names(self):
+        # Neo4j rejects a CALL {} that returns a variable already bound outside it.
+        for body in re.findall(r"CALL \{\n(.*?)\n\}", RANKED_EXPANSION, re.DOTALL):
+            for branch in body.split("UNION"):
+                imported = re.match(r"\s*WITH ([\w, ]+)\n", branch).group(1).split(", ")
+                returned = _columns(branch.rsplit("RETURN", 1)[1])
+                self.assertFalse(set(imported) & set(returned), branch)
+
+
+@mock.patch.object(neo4j_connector, "RETRIEVAL_MODE", "ranked")
+class ExpandQuestionTests(SimpleTestCase):
+    def test_failing_ranked_query_falls_back_to_one_hop(self):
+        def ranked(question):
+            raise CypherSyntaxError("Variable `via` already declared in outer scope")
+
+        with mock.patch.object(neo4j_connector, "search_and_expand_ranked", ranked), \
+                mock.patch.object(neo4j_connector, "search_and_expand", lambda question: EXPANDED):
+            self.assertIs(expand_question("Zackel"), EXPANDED)
@@ -0,0 +1,84 @@
+import tempfile
+import unittest
+
+from django.test import SimpleTestCase
+
+from main.graph import series_store
+from main.graph.series_store import DEVICE_DATA, SeriesStore, record_to_row, series_day_id
+from main.graph.telemetry import AnomalyDetector, write_device_batch
+from main.tests.utils import RecordingTransaction, reading, steady_readings
+
+# numpy is an optional dependency of the series store.
+requires_numpy = unittest.skipUnless(series_store.np is not None, "numpy is not installed")
+
+
+@requires_numpy
+class SeriesStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = SeriesStore(self.tmp.name)
+
+    def stored(self, store=None):
+        return (store or self.store).read_range(DEVICE_DATA, "CS342", "2025-09-01", "2025-10-01")
+
+    def test_append_sorts_and_drops_repeats(self):
+        self.store.append(DEVICE_DATA, "CS342", [reading(3), reading(1), reading(2), reading(1)])
+        self.assertEqual(list(self.stored()["id"]), [1, 2, 3])
+
+    def test_late_and_replayed_rows_are_merged(self):
+        self.store.append(DEVICE_DATA, "CS342", [reading(2), reading(4)])
+        written = self.store.append(DEVICE_DATA, "CS342", [reading(3), reading(4)])
+        self.assertEqual(list(self.stored()["id"]), [2, 3, 4])
+        self.assertEqual([p["day"] for p in written], ["2025-09-15"])
+        self.assertEqual(self.store.append(DEVICE_DATA, "CS342", [reading(3)]), [])
+
+    def test_non_numeric_reading_id_is_kept_as_minus_one(self):
+        row = dict(reading(1), id="a1b2")
+        self.store.append(DEVICE_DATA, "CS342", [row])
+        record = self.stored()[0]
+        self.assertEqual(int(record["id"]), -1)
+        self.assertIsNone(record_to_row(DEVICE_DATA, record)["id"])
+
+    def test_two_writers_on_one_store_stay_sorted(self):
+        other = SeriesStore(self.tmp.name)
+        self.store.append(DEVICE_DATA, "CS342", [reading(5)])
+        other.append(DEVICE_DATA, "CS342", [reading(6)])
+        # This instance must see the other writer's row, not append out of order.
+        self.store.append(DEVICE_DATA, "CS342", [reading(4)])
+        self.assertEqual(list(self.stored(other)["id"]), [4, 5, 6])
+
+    def test_iter_range_yields_views_on_the_mapped_files(self):
+        import numpy as np
+
+        self.store.append(DEVICE_DATA, "CS342", steady_readings(30))
+        views = list(self.store.iter_range(DEVICE_DATA, "CS342", "2025-09-15 12:00:00", "2025-09-16 03:00:00"))
+        self.assertEqual([len(v) for v in views], [12, 3])
+        for view in views:
+            self.assertIsInstance(view.base, np.memmap)
+
+    def test_latest_spans_days(self):
+        self.store.append(DEVICE_DATA, "CS342", steady_readings(26))
+        latest = self.store.latest(DEVICE_DATA, "CS342", 4)
+        self.assertEqual(list(latest["id"]), [22, 23, 24, 25])
+        self.assertEqual(record_to_row(DEVICE_DATA, latest[-1])["created"], "2025-09-16 01:00:00")
+        self.assertEqual(len(self.store.latest(DEVICE_DATA, "unknown", 4)), 0)
+
+
+@requires_numpy
+class StoredBatchTests(SimpleTestCase):
+    def test_alerts_link_to_the_rollup_of_their_reading(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        tx = RecordingTransaction()
+        batch = steady_readings(48) + [reading(48, temperature=31.5)]
+        write_device_batch(tx, batch, AnomalyDetector(), SeriesStore(tmp.name))
+
+        self.assertFalse(tx.matching("MERGE (dd:DeviceData"))
+        queries = [query for query, _ in tx.statements]
+        rollups = [i for i, q in enumerate(queries) if "MERGE (s:SeriesDay" in q]
+        alert = next(i for i, q in enumerate(queries) if "MERGE (al:Alert" in q)
+        self.assertEqual(len(rollups), 3)
+        self.assertLess(max(rollups), alert)
+        (_, params), = tx.matching("MERGE (al:Alert")
+        self.assertEqual(params["series_day"], series_day_id(DEVICE_DATA, "CS342", "2025-09-17"))
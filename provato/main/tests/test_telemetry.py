@@ -0,0 +1,76 @@
+from django.test import SimpleTestCase
+
+from main.graph.telemetry import (
+    ALERT_FEVER_TEMP, ALERT_MIN_SAMPLES, ALERT_Z_SCORE, AnomalyDetector, RollingStats, write_device_batch,
+)
+from main.tests.utils import RecordingTransaction, reading, steady_readings
+
+
+class RollingStatsTests(SimpleTestCase):
+    def test_matches_plain_mean_during_warm_up(self):
+        stats = RollingStats()
+        for x in (1.0, 2.0, 3.0, 4.0):
+            stats.update(x)
+        self.assertAlmostEqual(stats.mean, 2.5)
+        self.assertEqual(stats.count, 4)
+
+    def test_no_zscore_before_min_samples(self):
+        stats = RollingStats()
+        for x in range(ALERT_MIN_SAMPLES - 1):
+            stats.update(float(x % 3))
+        self.assertIsNone(stats.zscore(100.0))
+        stats.update(1.0)
+        self.assertIsNotNone(stats.zscore(100.0))
+
+
+class AnomalyDetectorTests(SimpleTestCase):
+    def test_steady_readings_raise_nothing(self):
+        detector = AnomalyDetector()
+        alerts = [a for row in steady_readings(48) for a in detector.check("CS342", row)]
+        self.assertEqual(alerts, [])
+
+    def test_spike_after_warm_up_is_a_fever(self):
+        detector = AnomalyDetector()
+        for row in steady_readings(48):
+            detector.check("CS342", row)
+        alerts = detector.check("CS342", reading(48, temperature=31.5))
+        self.assertEqual([a["kind"] for a in alerts], ["fever"])
+        self.assertGreaterEqual(alerts[0]["zscore"], ALERT_Z_SCORE)
+        self.assertEqual(alerts[0]["id"], "48:fever")
+
+    def test_absolute_threshold_applies_before_warm_up(self):
+        detector = AnomalyDetector()
+        alerts = detector.check("CS342", reading(0, temperature=ALERT_FEVER_TEMP + 0.1))
+        self.assertEqual([a["kind"] for a in alerts], ["fever"])
+        self.assertIsNone(alerts[0]["zscore"])
+
+    def test_state_round_trip(self):
+        detector = AnomalyDetector()
+        for row in steady_readings(30):
+            detector.check("CS342", row)
+        resumed = AnomalyDetector()
+        resumed.load_state("CS342", detector.state("CS342"))
+        spike = reading(30, temperature=31.0)
+        self.assertEqual(resumed.check("CS342", dict(spike)), detector.check("CS342", dict(spike)))
+
+
+class WriteDeviceBatchTests(SimpleTestCase):
+    def test_devices_are_matched_on_id_api(self):
+        detector = AnomalyDetector()
+        batch = steady_readings(48) + [reading(48, temperature=31.5)]
+        tx = RecordingTransaction()
+        alert_count = write_device_batch(tx, batch, detector)
+
+        self.assertEqual(alert_count, 1)
+        device_statements = tx.matching(":Device")
+        self.assertTrue(device_statements)
+        for query, params in device_statements:
+            self.assertNotIn("Device {id:", query)
+            self.assertIn("CS342", params.values() if "ids" not in params else params["ids"])
+
+        (alert_query, alert_params), = tx.matching("MERGE (al:Alert")
+        self.assertIn("Device {id_api: $id_api}", alert_query)
+        self.assertEqual(alert_params["id_api"], "CS342")
+        (_, state_params), = tx.matching("SET d += $state")
+        self.assertEqual(state_params["id"], "CS342")
+        self.assertEqual(state_params["state"]["temp_count"], 49)
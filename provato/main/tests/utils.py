@@ -0,0 +1,87 @@
+"""Helpers shared by the test modules. Nothing here talks to Neo4j or OpenAI."""
+
+
+class RecordingTransaction:
+    """Stands in for a neo4j transaction: records every statement, returns no rows."""
+
+    def __init__(self, results=None):
+        self.statements = []
+        self.results = results or {}
+
+    def run(self, query, parameters=None, **kwargs):
+        params = dict(parameters or {}, **kwargs)
+        self.statements.append((query, params))
+        for marker, rows in self.results.items():
+            if marker in query:
+                return rows
+        return []
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def matching(self, text):
+        return [(query, params) for query, params in self.statements if text in query]
+
+
+def reading(n, id_api="CS342", temperature=30.0, std=(300, 300, 300), created=None):
+    """A device_data.csv-style row, one hour apart per n."""
+    return {
+        "id": str(n), "id_api": id_api,
+        "created": created or f"2025-09-{15 + n // 24:02d} {n % 24:02d}:00:00",
+        "acc_x": "0", "acc_y": "0", "acc_z": "-14336",
+        "std_x": str(std[0]), "std_y": str(std[1]), "std_z": str(std[2]),
+        "max_x": "0", "max_y": "0", "max_z": "0",
+        "temperature": str(temperature), "coordinates": "(22.41,37.42)",
+    }
+
+
+def steady_readings(count, id_api="CS342", start=0):
+    """Readings with a small deterministic temperature wobble around 30.0."""
+    return [reading(start + n, id_api, temperature=30.0 + (0.2 if n % 2 else -0.2)) for n in range(count)]
+
+
+class FlakyDriver:
+    """
+    Driver stand-in whose first `fail_commits` commits raise `error`.
+    Transactions that did commit are kept in `committed`.
+    """
+
+    def __init__(self, fail_commits=0, error=None):
+        self.fail_commits = fail_commits
+        self.error = error or RuntimeError("commit failed")
+        self.committed = []
+
+    def session(self, **kwargs):
+        return _FlakySession(self)
+
+
+class _FlakyTransaction(RecordingTransaction):
+    def __init__(self, driver):
+        super().__init__()
+        self.driver = driver
+
+    def commit(self):
+        if self.driver.fail_commits > 0:
+            self.driver.fail_commits -= 1
+            raise self.driver.error
+        self.driver.committed.append(self)
+
+
+class _FlakySession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def begin_transaction(self):
+        return _FlakyTransaction(self.driver)
+
+    def run(self, query, parameters=None, **kwargs):
+        return []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
@@ -1,5 +1,6 @@
 from django.urls import path
 from . import views
+from .metrics import metrics_view
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -7,6 +8,12 @@ urlpatterns = [
     path('contact/', views.contact, name='contact'),
     path('detail/<str:node_id>/', views.detail_view, name='detail'),
     path('autocomplete/', views.autocomplete_view, name='autocomplete'),
+    path('alerts/', views.alerts_view, name='alerts'),
+    path('farms/summary/', views.farm_summary_view, name='farm_summaries'),
+    path('farms/<str:farm_id>/summary/', views.farm_summary_view, name='farm_summary'),
     path('chat/', views.chat_view, name='chat'),
+    path('chat/batch/', views.chat_batch_view, name='chat_batch'),
     path('qa/', views.qa_redirect_view, name='qa_redirect'),
+    path('ingest/', views.ingest_view, name='ingest'),
+    path('metrics/', metrics_view, name='metrics'),
 ]
@@ -1,7 +1,25 @@
+import csv
+import hmac
+import io
+import json
+import os
+import time
+
+from django.conf import settings
 from django.http import JsonResponse
 from django.shortcuts import redirect
-from .graph.neo4j_connector import get_suggestions, get_node_by_id, universal_search, search_and_expand, run_generated_cypher
-from .llm import call_llm, extract_search_plan
+from django.views.decorators.csrf import csrf_exempt
+from .graph.neo4j_connector import (
+    get_alerted_animals, get_suggestions, get_node_by_id, universal_search, retrieve_context,
+)
+from .graph.series_store import normalize_ts
+from .llm import call_llm, extract_search_plan, summarize_conversation
+from .conversation import load_conversation, save_conversation
+from .batch import CHAT_BATCH_MAX_QUESTIONS, answer_batch
+from .ingest import BufferFull, get_buffer, normalize_reading
+from .metrics import observe_size
+from .http_cache import graph_cached
+from .aggregates import FARM_ACTIVE_HOURS, farm_summaries, summary_context, summary_retrieval
 from django.core.mail import send_mail
 from django.shortcuts import render
 
@@ -32,6 +50,7 @@ def contact(request):
 def about(request):
     return render(request, "about.html")
 
+@graph_cached(lambda request, node_id: (node_id,))
 def detail_view(request, node_id):
     node = get_node_by_id(node_id)
 
@@ -60,6 +79,7 @@ def detail_view(request, node_id):
     })
 
 
+@graph_cached(lambda request: (request.GET.urlencode(),))
 def home(request):
     query = request.GET.get("q")
     if not query:
@@ -76,6 +96,7 @@ def home(request):
     }
     return render(request, "home.html", context)
 
+@graph_cached(lambda request: (request.GET.get("q", ""),))
 def autocomplete_view(request):
     partial = request.GET.get("q", "")
     results = get_suggestions(partial)
@@ -83,6 +104,37 @@ def autocomplete_view(request):
 
 
 
+@graph_cached(lambda request: (request.GET.urlencode(),))
+def alerts_view(request):
+    """
+    Animals with fever / low-movement alerts, most recent first.
+    Optional ?since=<ISO timestamp, UTC unless it has an offset>, ?kind=fever|low_movement, ?limit=N.
+    """
+    try:
+        limit = max(1, min(int(request.GET.get("limit", "50")), 500))
+    except ValueError:
+        return JsonResponse({"error": "Invalid limit"}, status=400)
+    since = request.GET.get("since")
+    animals = get_alerted_animals(since=normalize_ts(since) if since else None,
+                                  kind=request.GET.get("kind") or None, limit=limit)
+    return JsonResponse({"animals": animals})
+
+
+@graph_cached(lambda request, farm_id=None: (farm_id, int(time.time() // 3600)))
+def farm_summary_view(request, farm_id=None):
+    """
+    Precomputed farm aggregates: counts by type/sex/breed, devices, latest
+    per-animal vitals and alert counts. Active figures use the last
+    FARM_ACTIVE_HOURS hours.
+    """
+    summaries = farm_summaries(farm_id)
+    if farm_id is not None:
+        if not summaries:
+            return JsonResponse({"error": "Farm summary not found"}, status=404)
+        return JsonResponse(summaries[0])
+    return JsonResponse({"farms": summaries, "active_hours": FARM_ACTIVE_HOURS})
+
+
 def chat_view(request):
     if request.method != "GET":
         return JsonResponse({"error": "Invalid method"}, status=405)
@@ -91,26 +143,76 @@ def chat_view(request):
     if not question:
         return JsonResponse({"error": "No question provided"}, status=400)
 
-    # Reset session each chat to avoid cross-topic replies
-    request.session.flush()
-    history = [{"role": "user", "content": question}]
+    conversation = load_conversation(request)
 
-    plan = extract_search_plan(question)
-    cypher = plan.get("cypher")
-    retrieval = run_generated_cypher(cypher) if cypher else search_and_expand(question)
+    # Farm-wide counts and averages come from the precomputed summaries,
+    # skipping the Cypher aggregation (and, for obvious ones, the planner).
+    retrieval = summary_retrieval(question)
+    reused = False
+    if retrieval is not None:
+        plan, cypher = {"route": "farm_summary"}, None
+    else:
+        plan = extract_search_plan(question, conversation.planning_context())
+        cypher = plan.get("cypher")
+        if plan.get("route") == "farm_summary":
+            retrieval = summary_context()
+    if retrieval is None:
+        retrieval, reused = retrieve_context(cypher, question, conversation.retrieval)
+    observe_size("context_chars", len(retrieval.get("text_context", "")))
 
-    answer_payload = call_llm(question, retrieval.get("text_context", ""), history)
+    answer_payload = call_llm(
+        question,
+        retrieval.get("text_context", ""),
+        conversation.history() + [{"role": "user", "content": question}],
+        summary=conversation.summary,
+    )
 
-    history.append({"role": "assistant", "content": answer_payload["answer"]})
-    request.session["chat_history"] = history[-10:]
-    request.session.modified = True
+    conversation.add_turn(question, answer_payload["answer"], cypher)
+    conversation.remember_entities(retrieval.get("nodes"))
+    conversation.fit_budget(summarize_conversation)
 
-    return JsonResponse({
+    response = JsonResponse({
         "question": question,
         "answer": answer_payload["answer"],
         "source": answer_payload["source"],
         "facts_count": len(retrieval.get("facts", [])),
         "plan": plan,
+        "retrieval_reused": reused,
+        "conversation": conversation.id,
+    })
+    save_conversation(conversation, response)
+    return response
+
+
+@csrf_exempt
+def chat_batch_view(request):
+    """
+    POST {"questions": [...]} (or a bare list). Answers every question in one
+    response with per-question timings; duplicates are answered once.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid method"}, status=405)
+
+    try:
+        payload = json.loads(request.body or b"[]")
+    except ValueError:
+        return JsonResponse({"error": "Malformed body"}, status=400)
+    questions = payload.get("questions", []) if isinstance(payload, dict) else payload
+    if not isinstance(questions, list):
+        return JsonResponse({"error": "Expected a list of questions"}, status=400)
+
+    questions = [q.strip() for q in questions if isinstance(q, str) and q.strip()]
+    if not questions:
+        return JsonResponse({"error": "No question provided"}, status=400)
+    if len(questions) > CHAT_BATCH_MAX_QUESTIONS:
+        return JsonResponse({"error": f"At most {CHAT_BATCH_MAX_QUESTIONS} questions per batch"}, status=400)
+
+    start = time.perf_counter()
+    results = answer_batch(questions)
+    return JsonResponse({
+        "results": results,
+        "distinct_questions": len({r.get("duplicate_of") or r["question"] for r in results}),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
     })
 
 
@@ -121,3 +223,52 @@ def qa_redirect_view(request):
         if q:
             return redirect(f"/chat/?q={q}")
     return redirect("/chat/")
+
+
+INGEST_TOKEN = os.getenv("INGEST_TOKEN", "")
+
+
+@csrf_exempt
+def ingest_view(request):
+    """
+    Batched collar readings from the Sigfox/GSM gateways.
+    Accepts a JSON list (or {"readings": [...]}) or a device_data.csv-style CSV body.
+    Readings are buffered and written to Neo4j in the background.
+    Requires `Authorization: Bearer $INGEST_TOKEN`; without a configured token
+    the endpoint only accepts readings when DEBUG is on.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid method"}, status=405)
+
+    if not INGEST_TOKEN:
+        if not settings.DEBUG:
+            return JsonResponse({"error": "Ingest is disabled: INGEST_TOKEN is not set"}, status=403)
+    elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {INGEST_TOKEN}"):
+        return JsonResponse({"error": "Unauthorized"}, status=401)
+
+    try:
+        if request.content_type == "text/csv":
+            rows = list(csv.DictReader(io.StringIO(request.body.decode("utf-8-sig"))))
+        else:
+            payload = json.loads(request.body or b"[]")
+            rows = payload.get("readings", []) if isinstance(payload, dict) else payload
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({"error": "Malformed body"}, status=400)
+
+    if not isinstance(rows, list):
+        return JsonResponse({"error": "Expected a list of readings"}, status=400)
+
+    readings = [r for r in (normalize_reading(row) for row in rows if isinstance(row, dict)) if r]
+    rejected = len(rows) - len(readings)
+    if not readings:
+        return JsonResponse({"accepted": 0, "rejected": rejected}, status=400)
+
+    buffer = get_buffer()
+    try:
+        buffer.put_many(readings)
+    except BufferFull:
+        response = JsonResponse({"error": "Ingest queue full", "pending": buffer.pending()}, status=429)
+        response["Retry-After"] = str(max(1, int(buffer.flush_seconds)))
+        return response
+
+    return JsonResponse({"accepted": len(readings), "rejected": rejected}, status=202)
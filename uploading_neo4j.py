@@ -1,20 +1,26 @@
 import csv
-from neo4j import GraphDatabase
 import os
+import sys
 
-NEO4J_URI = os.getenv("NEO4J_URI", "neo4j+ssc://53ed6a0b.databases.neo4j.io")
-NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
-NEO4J_PASS = os.getenv("NEO4J_PASS", "")
-NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "provato"))
+from main.graph.telemetry import (  # noqa: E402
+    AnomalyDetector, ensure_alert_indexes, load_detector_state, write_device_batch,
+)
+from main.graph.series_store import METEO_DATA, get_store, write_rollups  # noqa: E402
+from main.graph.version import bump_graph_version  # noqa: E402
+from main.graph.farm_summary import (  # noqa: E402
+    rebuild_farm_summaries, refresh_device_farms, refresh_farm_summaries,
+)
+from main.graph.driver import NEO4J_DB, close_driver, get_driver  # noqa: E402
 
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASS))
+NEO4J_DATABASE = NEO4J_DB
 
 BATCH_SIZE = 500  # number of rows per transaction
 
 
 def load_csv(file_path, callback):
     """Read a CSV and yield rows as dicts"""
-    with open(file_path, newline='', encoding='utf-8') as f:
+    with open(file_path, newline='', encoding='utf-8-sig') as f:
         reader = csv.DictReader(f)
         batch = []
         for row in reader:
@@ -28,7 +34,7 @@ def load_csv(file_path, callback):
 
 def upload_farms(file_path):
     def insert(batch):
-        with driver.session(database=NEO4J_DATABASE) as session:
+        with get_driver().session(database=NEO4J_DATABASE) as session:
             tx = session.begin_transaction()
             for row in batch:
                 tx.run(
@@ -41,6 +47,8 @@ def upload_farms(file_path):
                     name=row.get('name', ''),
                     coordinates=row.get('coordinates', '')
                 )
+            refresh_farm_summaries(tx, [row['id'] for row in batch])
+            bump_graph_version(tx)
             tx.commit()
     load_csv(file_path, insert)
     print("Farms uploaded.")
@@ -48,7 +56,7 @@ def upload_farms(file_path):
 
 def upload_animals(file_path):
     def insert(batch):
-        with driver.session(database=NEO4J_DATABASE) as session:
+        with get_driver().session(database=NEO4J_DATABASE) as session:
             tx = session.begin_transaction()
             for row in batch:
                 tx.run(
@@ -75,6 +83,8 @@ def upload_animals(file_path):
                     breed_short=row.get('breed_short'),
                     farm_id=row.get('farm_id')
                 )
+            refresh_farm_summaries(tx, [row.get('farm_id') for row in batch])
+            bump_graph_version(tx)
             tx.commit()
     load_csv(file_path, insert)
     print("Animals uploaded.")
@@ -82,72 +92,76 @@ def upload_animals(file_path):
 
 def upload_devices(file_path):
     def insert(batch):
-        with driver.session(database=NEO4J_DATABASE) as session:
+        with get_driver().session(database=NEO4J_DATABASE) as session:
             tx = session.begin_transaction()
             for row in batch:
                 tx.run(
                     """
                     MERGE (d:Device {id: $id})
-                    SET d.type = $type
+                    SET d.type = $type,
+                        d.id_api = $id_api
                     WITH d
                     MATCH (a:Animal {id_api: $id_animal})
                     MERGE (d)-[:ATTACHED_TO]->(a)
                     """,
                     id=row['id'],
                     type=row.get('type'),
+                    id_api=(row.get('id_api') or '').strip(),
                     id_animal=row.get('id_animal')
                 )
+            # Summaries are keyed on the collar's id_api, not the devices.csv row id.
+            refresh_device_farms(tx, {row['id_api'].strip() for row in batch if row.get('id_api')})
+            bump_graph_version(tx)
             tx.commit()
     load_csv(file_path, insert)
     print("Devices uploaded.")
 
 
 def upload_device_data(file_path):
+    """
+    Upload collar readings and run the streaming anomaly detector over them.
+    Alerts and the per-device rolling statistics are written in the same
+    transaction as the readings that produced them. With SERIES_STORE_PATH
+    set, the raw readings go to the columnar store instead of DeviceData nodes.
+    """
+    detector = AnomalyDetector()
+    store = get_store()
+    with get_driver().session(database=NEO4J_DATABASE) as session:
+        ensure_alert_indexes(session)
+        load_detector_state(session, detector)
+
+    alert_count = 0
+
     def insert(batch):
-        with driver.session(database=NEO4J_DATABASE) as session:
+        nonlocal alert_count
+        batch_detector = detector.fork({row.get('id_api') for row in batch})
+        with get_driver().session(database=NEO4J_DATABASE) as session:
             tx = session.begin_transaction()
-            for row in batch:
-                tx.run(
-                    """
-                    MERGE (dd:DeviceData {id: $id})
-                    SET dd.created = $created,
-                        dd.acc_x = toFloat($acc_x),
-                        dd.acc_y = toFloat($acc_y),
-                        dd.acc_z = toFloat($acc_z),
-                        dd.std_x = toFloat($std_x),
-                        dd.std_y = toFloat($std_y),
-                        dd.std_z = toFloat($std_z),
-                        dd.max_x = toFloat($max_x),
-                        dd.max_y = toFloat($max_y),
-                        dd.max_z = toFloat($max_z),
-                        dd.temperature = toFloat($temperature),
-                        dd.coordinates = $coordinates
-                    WITH dd
-                    MATCH (d:Device {id: $id_api})
-                    MERGE (dd)-[:FROM_DEVICE]->(d)
-                    """,
-                    id=row['id'],
-                    created=row.get('created'),
-                    acc_x=row.get('acc_x', '0'),
-                    acc_y=row.get('acc_y', '0'),
-                    acc_z=row.get('acc_z', '0'),
-                    std_x=row.get('std_x', '0'),
-                    std_y=row.get('std_y', '0'),
-                    std_z=row.get('std_z', '0'),
-                    max_x=row.get('max_x', '0'),
-                    max_y=row.get('max_y', '0'),
-                    max_z=row.get('max_z', '0'),
-                    temperature=row.get('temperature', '0'),
-                    coordinates=row.get('coordinates', ''),
-                    id_api=row.get('id_api')
-                )
+            alert_count += write_device_batch(tx, batch, batch_detector, store)
             tx.commit()
+        detector.absorb(batch_detector)
     load_csv(file_path, insert)
-    print("Device data uploaded.")
+    print(f"Device data uploaded ({alert_count} alerts raised).")
 
 def upload_meteo_data(file_path):
+    store = get_store()
+
+    def insert_series(batch):
+        """Raw observations to the columnar store, SeriesDay rollups to the graph."""
+        by_farm = {}
+        for row in batch:
+            by_farm.setdefault(row.get('farm_id_api'), []).append(row)
+        with get_driver().session(database=NEO4J_DATABASE) as session:
+            tx = session.begin_transaction()
+            for farm_id_api, rows in by_farm.items():
+                write_rollups(tx, store, store.append(METEO_DATA, farm_id_api, rows))
+            bump_graph_version(tx)
+            tx.commit()
+
     def insert(batch):
-        with driver.session(database=NEO4J_DATABASE) as session:
+        if store is not None:
+            return insert_series(batch)
+        with get_driver().session(database=NEO4J_DATABASE) as session:
             tx = session.begin_transaction()
             for row in batch:
                 # create unique id if missing
@@ -198,6 +212,7 @@ def upload_meteo_data(file_path):
                     solar_radiation=row.get('solar_radiation', '0'),
                     farm_id_api=row.get('farm_id_api')
                 )
+            bump_graph_version(tx)
             tx.commit()
     load_csv(file_path, insert)
     print("Meteo data uploaded.")
@@ -207,7 +222,7 @@ def upload_meteo_data(file_path):
 def upload_farm_contacts(file_path):
     """Upload farm_contacts.csv defining distances between sheep in the same farm."""
     def insert(batch):
-        with driver.session(database=NEO4J_DATABASE) as session:
+        with get_driver().session(database=NEO4J_DATABASE) as session:
             tx = session.begin_transaction()
             for row in batch:
                 try:
@@ -227,6 +242,7 @@ def upload_farm_contacts(file_path):
                     )
                 except Exception as e:
                     print("Error linking sheep:", e)
+            bump_graph_version(tx)
             tx.commit()
     load_csv(file_path, insert)
     print("Farm contacts uploaded.")
@@ -239,5 +255,8 @@ if __name__ == "__main__":
     # upload_device_data("device_data.csv")
     # upload_meteo_data("meteo_data.csv")
     upload_farm_contacts("farm_contacts.csv")
+    with get_driver().session(database=NEO4J_DATABASE) as session:
+        rebuild_farm_summaries(session)
+    print("Farm summaries rebuilt.")
     print("All CSVs uploaded (excluding device_data).")
-    driver.close()
+    close_driver()